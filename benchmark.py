@@ -0,0 +1,75 @@
+import argparse
+import sys
+from packages.utils.utils import read_config
+from packages.utils.benchmark import *
+
+def run(args):
+    config = read_config(args.config)
+    cases = bench_cases(config, quick=args.quick)
+    if args.filter:
+        cases = [(name, conf) for name, conf in cases if args.filter in name]
+
+    def on_result(name, metrics):
+        if metrics['error'] is not None:
+            print(f"{name}: failed\n{metrics['error']}")
+        else:
+            print(f"{name}: {metrics['throughput']:.1f} tasks/s, slot {metrics['slot_time_mean']:.2f} ms "
+                  f"(p95 {metrics['slot_time_p95']:.2f} ms), generation {metrics['generation_time']:.3f} s, "
+                  f"peak RSS {metrics['peak_rss']:.1f} MB")
+        sys.stdout.flush()
+
+    results = run_benchmark(cases, args.repeat, on_result)
+    if not args.filter or args.filter in f"startup/{STARTUP_MODULE}":
+        results[f"startup/{STARTUP_MODULE}"] = startup(args)
+    save_baseline(args.out, results, {name: conf for name, conf in cases})
+    print(f"Saved {len(results)} cases to {args.out}")
+
+    if args.baseline:
+        return compare_files(args.baseline, args.out, args.tolerance, args.all)
+    return 0
+
+def startup(args):
+    metrics = import_time(STARTUP_MODULE, args.repeat)
+    if metrics['error'] is not None:
+        print(f"import {STARTUP_MODULE}: failed\n{metrics['error']}")
+    else:
+        print(f"import {STARTUP_MODULE}: {metrics['import_time']:.1f} ms (median {metrics['import_time_median']:.1f} ms), "
+              f"heavy modules loaded: {metrics['heavy_modules']}")
+    return metrics
+
+def compare_files(baseline_path, current_path, tolerance, show_all=False):
+    rows, regressions = compare(load_baseline(baseline_path), load_baseline(current_path), tolerance)
+    print(format_rows(rows, only_changed=not show_all))
+    print(f"{regressions} regression(s) beyond {tolerance:.0%} against {baseline_path}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the simulator with regression tracking")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('run', help="run the benchmark cases and save them as a JSON baseline")
+    p.add_argument('--config', default='config.yml')
+    p.add_argument('--out', default='results/benchmark/current.json')
+    p.add_argument('--repeat', type=int, default=3, help="repetitions per case, the best one is kept")
+    p.add_argument('--quick', action='store_true', help="only the smallest case of every spec, with fewer slots")
+    p.add_argument('--filter', default='', help="only the cases whose name contains this string")
+    p.add_argument('--baseline', default='', help="compare against this baseline once finished")
+    p.add_argument('--tolerance', type=float, default=0.1)
+    p.add_argument('--all', action='store_true', help="also print the unchanged metrics")
+
+    p = commands.add_parser('startup', help=f"time import {STARTUP_MODULE} in fresh interpreters")
+    p.add_argument('--repeat', type=int, default=5)
+
+    p = commands.add_parser('compare', help="compare two saved baselines, exit 1 on regressions")
+    p.add_argument('baseline')
+    p.add_argument('current')
+    p.add_argument('--tolerance', type=float, default=0.1)
+    p.add_argument('--all', action='store_true', help="also print the unchanged metrics")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        sys.exit(run(args))
+    elif args.command == 'startup':
+        startup(args)
+    else:
+        sys.exit(compare_files(args.baseline, args.current, args.tolerance, args.all))
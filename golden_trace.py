@@ -0,0 +1,58 @@
+import argparse
+import yaml
+import sys
+from packages.utils.utils import read_config
+from packages.utils.golden_trace import *
+
+def parse_overrides(items):
+    """['key=value', ...] -> {key: value}, values parsed as YAML"""
+    overrides = {}
+    for item in items:
+        key, value = item.split('=', 1)
+        overrides[key] = yaml.safe_load(value)
+    return overrides
+
+def record(args):
+    config = read_config(args.config)
+    config.update(parse_overrides(args.set))
+    trace = record_trace(config)
+    trace.save(args.out)
+    print(f"Recorded {len(trace.records)} decisions of {len(trace.statistics)} episodes to {args.out}")
+    return 0
+
+def check(args):
+    golden = GoldenTrace.load(args.golden)
+    config = dict(golden.config)
+    config.update(parse_overrides(args.set))
+    trace = record_trace(config)
+
+    divergence, mismatches = check_equivalence(golden, trace, args.rtol, args.atol, args.ignore)
+    if divergence is not None:
+        print(divergence)
+    for episode, key, ref, alt in mismatches:
+        print(f"Episode {episode} {key}: {ref} != {alt}")
+    if divergence is None and not len(mismatches):
+        checked = "decisions" if len(args.ignore) else f"decisions and {len(trace.statistics)} episode statistics"
+        print(f"Equivalent: {len(trace.records)} {checked} match {args.golden}")
+        return 0
+    return 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the decisions of the reference engine and check alternative engines against them")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('record', help="simulate a config and save its decisions & statistics as a golden trace")
+    p.add_argument('--config', default='config.yml')
+    p.add_argument('--set', nargs='*', default=[], help="config overrides, e.g. N=200 num_ep_train=2")
+    p.add_argument('--out', default='results/golden/trace.json.gz')
+
+    p = commands.add_parser('check', help="replay the golden config with overrides (e.g. batched_task_generation=1), exit 1 on divergence")
+    p.add_argument('golden')
+    p.add_argument('--set', nargs='*', default=[], help="config overrides selecting the alternative engine")
+    p.add_argument('--rtol', type=float, default=0., help="0 for bit-for-bit equality of the float fields")
+    p.add_argument('--atol', type=float, default=0.)
+    p.add_argument('--ignore', nargs='*', default=[], choices=TRACE_FIELDS,
+                   help="fields left out, e.g. reward qos to check the decisions of an engine drawing jilters differently")
+
+    args = parser.parse_args()
+    sys.exit(record(args) if args.command == 'record' else check(args))
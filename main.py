@@ -6,6 +6,9 @@ import traceback
 from packages.alg.engine import *
 from packages.utils.utils import read_config
 from packages.utils.logger import Logger
+from packages.utils.sweep import *
+from packages.utils.results_store import ResultsStore
+from packages.env.openraas.catalog import Catalog, set_shared_catalog
 
 def cloud_model_type(conf):
     cm = conf['cloud_model']
@@ -30,6 +33,7 @@ def cloud_model_type(conf):
 def run_simulation(config):
     # print(f"start simulation with N {config['N']}")
     engine = Engine(config)
+    begin = time.time()
     try:
         ret = engine.run_simulation()
         print(f"Finshed {config['log_pretext']}_{config['M']}_{config['N']}_{config['cloud_model']}_{config['worker_rate']}")
@@ -38,35 +42,35 @@ def run_simulation(config):
         print(f"Wrong in {config['log_pretext']} {cloud_model_type(config)}: {e}")
         traceback.print_exc()
     # print(len(ret))
-    return ret
+    # logs, config, wall time (s)
+    return ret[0], ret[1], time.time() - begin
 
-def callback_simulation(x):
-    print("=====All Finished=====")
-    logger = Logger("results/openraas-simulation/simulation")
+def log_result(logger, ret):
+    """write the metrics of one finished config"""
+    logs, conf = ret[0], ret[1]
+    if logs == -1:
+        return
+    
+    if 'change_N' in conf['log_pretext']:
+        step = conf['N']
+        tag = cloud_model_type(conf)
+    if 'change_worker_rate' in conf['log_pretext']:
+        step = conf['worker_rate']*10
+        tag = str(conf['N'])
     
-    for logs, conf in x:
-        if logs == -1:
-            continue
-        
-        if 'change_N' in conf['log_pretext']:
-            step = conf['N']
-            tag = cloud_model_type(conf)
-        if 'change_worker_rate' in conf['log_pretext']:
-            step = conf['worker_rate']*10
-            tag = str(conf['N'])
-        
-        logger.scalars_summary(f"{conf['log_pretext']}/drop_rate", {tag: logs['drop_rate']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/server_cpu_rate", {tag: logs['server_cpu_rate']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/server_mem_rate", {tag: logs['server_mem_rate']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/server_bw_rate", {tag: logs['server_bw_rate']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/worker_cpu_rate", {tag: logs['worker_cpu_rate']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/worker_mem_rate", {tag: logs['worker_mem_rate']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/worker_bw_rate", {tag: logs['worker_bw_rate']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/drop_rate", {tag: logs['drop_rate']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/server_cpu_rate", {tag: logs['server_cpu_rate']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/server_mem_rate", {tag: logs['server_mem_rate']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/server_bw_rate", {tag: logs['server_bw_rate']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/worker_cpu_rate", {tag: logs['worker_cpu_rate']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/worker_mem_rate", {tag: logs['worker_mem_rate']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/worker_bw_rate", {tag: logs['worker_bw_rate']}, step)
 
-        logger.scalars_summary(f"{conf['log_pretext']}/start_delay", {tag: logs['start_delay']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/service_latency", {tag: logs['service_latency']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/speed", {tag: logs['speed']}, step)
-        logger.scalars_summary(f"{conf['log_pretext']}/jilter", {tag: logs['jilter']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/start_delay", {tag: logs['start_delay']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/service_latency", {tag: logs['service_latency']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/speed", {tag: logs['speed']}, step)
+    logger.scalars_summary(f"{conf['log_pretext']}/jilter", {tag: logs['jilter']}, step)
+    logger.flush()
 
 def callback_error(error):
     print("=====Something wrong in executing=====")
@@ -76,11 +80,8 @@ def callback_error(error):
     with open('error_log.txt', 'w') as f:
         f.write(time.ctime() + ':' + str(error) + '\n')
 
-def test_openraas(conf):
-    pool = mp.Pool(32)
-    
-    configs = []
-    
+def sweep_specs(conf):
+    """declarative sweeps of test_openraas, set 'enabled' to choose which ones to run"""
     if conf['debug_mode']:
         stepN = 300
         stepWR = 400
@@ -88,54 +89,69 @@ def test_openraas(conf):
         stepN = 100
         stepWR = 200
     
-    if 1:
-        # 1. change N desktop
-        config = copy.deepcopy(conf)
-        config['task_type'] = 2
-        config['log_pretext'] = 'change_N_' + str(config['task_type'])
-        # for N in range(1000, 20001, 1000):
-        for N in range(100, 1501, stepN):
-            config['N'] = N
-            for cloud_model in [0, 2, 3, 5]:
-            # for cloud_model in range(5):
-            # for cloud_model in [1]:
-                config['cloud_model'] = cloud_model
-                configs.append(copy.deepcopy(config))
+    return [
+        {
+            # 1. change N desktop
+            'enabled': 1,
+            'fixed': {'task_type': 2, 'log_pretext': 'change_N_2'},
+            'grid': {'N': list(range(100, 1501, stepN)), 'cloud_model': [0, 2, 3, 5]},
+        },
+        {
+            # 2. change worker_rate process
+            'enabled': 0,
+            'fixed': {'task_type': 0, 'log_pretext': 'change_worker_rate_0', 'cloud_model': 0},
+            'grid': {'N': list(range(100, 1501, stepWR)), 'worker_rate': [x*1./10. for x in range(0, 11, 1)]},
+        },
+        {
+            # 3. change N storage
+            'enabled': 0,
+            'fixed': {'task_type': 1, 'log_pretext': 'change_N_1'},
+            'grid': [
+                {'N': list(range(100, 1501, stepN)), 'public_data_deduplication': [1], 'cloud_model': [0, 2, 4]},
+                {'N': list(range(100, 1501, stepN)), 'public_data_deduplication': [0], 'cloud_model': [0, 3]},
+            ],
+        },
+    ]
+
+def test_openraas(conf):
+    configs = []
+    for spec in sweep_specs(conf):
+        if spec['enabled']:
+            configs += expand_grid(conf, spec)
     
-    if 0:
-        # 2. change worker_rate process
-        config = copy.deepcopy(conf)
-        config['task_type'] = 0
-        config['log_pretext'] = 'change_worker_rate_' + str(config['task_type'])
-        config['cloud_model'] = 0
-        for N in range(100, 1501, stepWR):
-            config['N'] = N
-            for x in range(0, 11, 1):
-                config['worker_rate'] = x*1./10.
-                configs.append(copy.deepcopy(config))
+    # every run is appended to the results store, TensorBoard is an optional sink
+    store = ResultsStore("results/openraas-simulation/results.sqlite")
+    logger = Logger("results/openraas-simulation/simulation") if conf['tensorboard_sink'] else None
+    writer = StreamingResultWriter("results/openraas-simulation/sweep.jsonl")
     
-    if 0:
-        # 2. change N storage
-        config = copy.deepcopy(conf)
-        config['task_type'] = 1
-        config['log_pretext'] = 'change_N_' + str(config['task_type'])
-        for N in range(100, 1501, stepN):
-            config['N'] = N
-            config['public_data_deduplication'] = 1
-            for cloud_model in [0, 2, 4]:
-                config['cloud_model'] = cloud_model
-                configs.append(copy.deepcopy(config))
-            config['public_data_deduplication'] = 0
-            for cloud_model in [0, 3]:
-                config['cloud_model'] = cloud_model
-                configs.append(copy.deepcopy(config))
+    def on_result(ret):
+        # every finished config is written immediately
+        try:
+            if ret[0] == -1:
+                return
+            store.add(*ret)
+            writer.write(*ret)
+            if logger is not None:
+                log_result(logger, ret)
+        except Exception as e:
+            callback_error(e)
     
-    pool.map_async(run_simulation, configs, callback=callback_simulation, error_callback=callback_error)
-    pool.close()
-    pool.join()
-
-    # while True:
-    time.sleep(1)
+    try:
+        # layers & applications are built once here and inherited by every worker
+        # drawn from the seed, not the global state, so that a config always gets the same catalog (and result)
+        catalog = None
+        if conf.get('shared_catalog', 1):
+            catalog = Catalog(seed=conf['seed'])
+        set_shared_catalog(catalog)
+        run_sweep(configs, run_simulation, 32, on_result, initializer=set_shared_catalog, initargs=(catalog,))
+        print("=====All Finished=====")
+    except Exception as e:
+        callback_error(e)
+    finally:
+        store.close()
+        writer.close()
+        if logger is not None:
+            logger.close()
 
 def debug(config):
     config['log_pretext'] = 'change_N'
@@ -153,9 +169,11 @@ def clear_logs():
     os.system(f"rm -rf {dir}/events.out.*")
 
 if __name__ == "__main__":
-    clear_logs()
-    
     config = read_config('config.yml')
     
+    if config['tensorboard_sink']:
+        # the results store is append-only, only TensorBoard events are rewritten
+        clear_logs()
+    
     test_openraas(copy.deepcopy(config))
     # debug(config)
\ No newline at end of file
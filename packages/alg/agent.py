@@ -1,7 +1,33 @@
 from ..env.wrapper import *
 from ..utils.logger import Logger
+from ..utils.replay_buffer import create_replay_buffer
+from ..utils.statistics import QoSStatistics, QUANTILE_SUFFIXES
 from .sim.openraas_greedy import *
 
+def parse_states(states, config):
+    """split a batch of states into the inputs of OPGreedy.get_actions
+
+    Args:
+        states (np.array): (tasks, state_len)
+
+    Returns:
+        compute_bandwidth (np.array): (tasks,)
+        candidates (np.array): (tasks, candidates_num, filestore_info_num)
+        valid (np.array): (tasks, candidates_num), False for paddings and for tasks without a compute worker
+    """
+    task_info_num = config['task_info_num']
+    filestore_info_num = config['filestore_info_num']
+    candidates_num = config['candidates_num']
+    
+    states = np.asarray(states, dtype=np.float64).reshape(-1, task_info_num+2+1+candidates_num*filestore_info_num)
+    compute_info = states[:, task_info_num:task_info_num+2]
+    candidates = states[:, task_info_num+3:].reshape(-1, candidates_num, filestore_info_num)
+    
+    # candidates are padded by [-1., -1., -1.] after the real ones
+    valid = np.cumprod(np.sum(candidates, axis=2) != -3., axis=1).astype(bool)
+    valid &= (compute_info[:, 0] != -1.)[:, None]
+    return compute_info[:, 1], candidates, valid
+
 class SimulationAgent(object):
     def __init__(self, config, log_dir=''):
         self.config = config
@@ -17,24 +43,25 @@ class SimulationAgent(object):
         
         # Algorithm
         self.alg = OPGreedy()
+        self.replay_buffer = create_replay_buffer(config, self.env_wrapper.env.state_len, self.env_wrapper.env.streams.get('replay'))
         
-        # Logger
-        log_path = f"{log_dir}/simulation"
-        self.logger = Logger(log_path)
+        # Logger, created on first use
+        self.log_path = f"{log_dir}/simulation"
+        self._logger = None
+    
+    @property
+    def logger(self):
+        if self._logger is None:
+            self._logger = Logger(self.log_path)
+        return self._logger
     
     def run(self):
         env = self.env_wrapper
         config = self.config
         
         logs = []
+        total_qos = QoSStatistics()   # merged over episodes, for quantiles
 
-        def get_state_clip(s, length):
-            # reset self.temp_point beforing using this function
-            begin = self.temp_point
-            end = begin + length
-            self.temp_point = end
-            return s[begin:end]
-        
         for episode in range(self.max_episodes):
             state = env.reset()
             
@@ -42,37 +69,17 @@ class SimulationAgent(object):
             for step in range(self.max_steps):
                 if slots >= self.config['max_slot_per_ep']:
                     break
-                task_info_num = config['task_info_num']
-                filestore_info_num = config['filestore_info_num']
-                candidates_num = config['candidates_num']
-                
-                # 1. modify state
-                self.temp_point = 0
-                tasks_info = get_state_clip(state, task_info_num)
-                compute_info = get_state_clip(state, 2)
-                all_cand_num = get_state_clip(state, 1)
-                candidates = get_state_clip(state, filestore_info_num * candidates_num)
-                
-                real_candidates_num = candidates_num
-                arranged_candidates_info = []      # (candidates_num, filestore_info_num)
-                for i in range(candidates_num):
-                    info = candidates[i * filestore_info_num : (i+1) * filestore_info_num]
-                    if np.sum(info) == -3.:
-                        real_candidates_num = i
-                        break
-                    arranged_candidates_info.append(info)
-                
                 
-                # 2. gain action
-                action = -1
-                if compute_info[0] != -1. and real_candidates_num:
-                    bws = [arranged_candidates_info[j][0] for j in range(real_candidates_num)]
-                    ls = [arranged_candidates_info[j][1] for j in range(real_candidates_num)]
-                    js = [arranged_candidates_info[j][2] for j in range(real_candidates_num)]
-                    action = self.alg.get_action(compute_info[1], bws, ls, js)
+                # 1. modify state & 2. gain action
+                compute_bandwidth, candidates, valid = parse_states(state, config)
+                action = int(self.alg.get_actions(compute_bandwidth, candidates, valid)[0])
                 
                 # 3. go into next step
-                state, reward, new_slot = env.step(action)
+                next_state, reward, new_slot = env.step(action)
+                if self.replay_buffer is not None:
+                    # the trajectory breaks when entering a new slot
+                    self.replay_buffer.add(state, action, reward, next_state, 0. if new_slot else 1.)
+                state = next_state
                 
                 if new_slot :
                     slots += 1
@@ -81,10 +88,19 @@ class SimulationAgent(object):
                 #     print(f"E{episode}S{step}: reward={reward}")
             if config['get_statistics']:
                 logs.append(env.log_episode_statistics())
+                total_qos.merge(env.env.qos_stats)
         
         mean_logs = {}
         if config['get_statistics']:
-            for key in logs[0]:
-                mean_logs[key] = np.mean([logs[i][key] for i in range(len(logs))])
+            # every mean (overall and per task type) is weighted per episode, as the baseline overall means,
+            # so that the per type means can be reconciled with the overall ones
+            keys = list(logs[0]) + sorted(set(key for log in logs[1:] for key in log) - set(logs[0]))
+            for key in keys:
+                mean_logs[key] = np.mean([log[key] for log in logs if key in log])
+            # quantiles are not averaged over episodes but read from the merged sketches
+            for key, value in total_qos.summary().items():
+                if key.endswith(QUANTILE_SUFFIXES):
+                    mean_logs[key] = value
+        env.close()
 
         return mean_logs
\ No newline at end of file
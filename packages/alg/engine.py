@@ -2,6 +2,7 @@ import numpy as np
 import os
 from datetime import datetime
 from .agent import *
+from ..utils.result_cache import ResultCache
 
 class Engine(object):
     def __init__(self, config):
@@ -10,6 +11,18 @@ class Engine(object):
     def run_simulation(self):
         config = self.config
         
+        # Return the cached logs of an identical config simulated by the same code
+        cache = None
+        if config.get('result_cache', 0):
+            cache = ResultCache(config.get('result_cache_path', '') or f"{config['results_path']}/cache")
+            logs = cache.get(config)
+            if logs is not None:
+                return logs, config
+            if not config.get('rng_streams', 0):
+                # the topology is drawn from the global state before the environment is seeded,
+                # seed it so that the cached logs are the only ones this config can give
+                np.random.seed(config['seed'])
+        
         # Create directory for experiment
         # experiment_dir = f"{config['results_path']}/openraas-{datetime.now():%Y-%m-%d_%H:%M:%S}"
         experiment_dir = f"{config['results_path']}/openraas-simulation"
@@ -20,5 +33,8 @@ class Engine(object):
         agent = SimulationAgent(config, experiment_dir)
         
         logs = agent.run()
+        
+        if cache is not None:
+            cache.put(config, logs)
 
         return logs, config
\ No newline at end of file
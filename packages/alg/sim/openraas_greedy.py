@@ -38,4 +38,33 @@ class OPGreedy(object):
         else:
             ans = top_bd[0]
         
-        return ans
\ No newline at end of file
+        return ans
+    
+    def get_actions(self, compute_bandwidth, candidates, valid):
+        """select candidates of a batch of tasks, giving the same choices as get_action
+        lexicographic argmax over (link bandwidth, -latency, -jilter), ties go to the smallest index
+
+        Args:
+            compute_bandwidth (np.array): (tasks,)
+            candidates (np.array): (tasks, candidates, 3), bandwidth, latency and jilter of each candidate
+            valid (np.array): (tasks, candidates) bool mask of real candidates
+
+        Returns:
+            np.array: (tasks,) the selection index of each task, -1 if it has no valid candidate
+        """
+        compute_bandwidth = np.asarray(compute_bandwidth, dtype=np.float64)
+        candidates = np.asarray(candidates, dtype=np.float64)
+        valid = np.asarray(valid, dtype=bool)
+        
+        link_bd = np.minimum(compute_bandwidth[:, None], candidates[:, :, 0])
+        keys = [link_bd, -candidates[:, :, 1], -candidates[:, :, 2]]
+        
+        # keep narrowing the tied candidates key by key
+        top = valid.copy()
+        for key in keys:
+            masked = np.where(top, key, -np.inf)
+            top &= masked == masked.max(axis=1, keepdims=True)
+        
+        actions = np.argmax(top, axis=1)
+        actions[~valid.any(axis=1)] = -1
+        return actions
@@ -1,4 +1,5 @@
 import numpy as np
+from .rng import *
 
 '''data.type
 -1: not set
@@ -83,7 +84,8 @@ class Application(Data):
 class LayerList(object):
     layer_num: int
     
-    def __init__(self):
+    def __init__(self, streams: RandomStreams=None):
+        self.streams = streams or UNSEEDED  # random streams of the environment
         self.layers = []  # store all layers, and sort by id
         self.os_layers = []
         self.driver_layers = []
@@ -137,7 +139,7 @@ class LayerList(object):
         layerlist = self.get_list(layer_type)
         num = layerlist.__len__()
         
-        index = np.random.randint(0, num)
+        index = self.streams.get('placement').randint(0, num)
         return layerlist[index]
     
     def get_next_data(self, data):
@@ -190,23 +192,32 @@ class LayerList(object):
 class ApplicationList(object):
     app_num: int
     
-    def __init__(self, layerList):
+    def __init__(self, layerList, app_specs=None, streams: RandomStreams=None):
+        '''
+        app_specs: [(size, type, env layer ids), ...] sorted by id to rebuild a known list without random draws
+        streams: random streams of the environment, drawing the apps ('apps') and picking them ('placement', 'tasks')
+        '''
+        self.streams = streams or UNSEEDED
         self.apps = [] # store all applications, and sort by id
         self.process_apps = []
         self.storage_apps = []
         self.desktop_apps = []
         self.type_num = 3
         self.layerList = layerList
-        self.init_apps()
+        if app_specs is None:
+            self.init_apps()
+        else:
+            self.init_apps_from_specs(app_specs)
     
     def init_apps(self):
+        rng = self.streams.get('apps')
         index = 0
         # processing
         for _ in range(50):
             app = Application(index, 500., 10)
-            osl = self.layerList.get_list(0)[np.random.randint(0,3)]
-            dl = self.layerList.get_list(1)[np.random.randint(1,5)]
-            ll = self.layerList.get_list(2)[np.random.randint(4,8)]
+            osl = self.layerList.get_list(0)[rng.randint(0,3)]
+            dl = self.layerList.get_list(1)[rng.randint(1,5)]
+            ll = self.layerList.get_list(2)[rng.randint(4,8)]
             app.env_layers = [osl, dl, ll]
             self.process_apps.append(app)
             index += 1
@@ -222,11 +233,11 @@ class ApplicationList(object):
         index += 1
         # desktop
         for _ in range(100):
-            size = max(20000 + 4000 * np.random.randn(1)[0], 1.)
+            size = max(20000 + 4000 * rng.randn(1)[0], 1.)
             app = Application(index, size, 12)
             osl = self.layerList.get_list(0)[1]
             dl = self.layerList.get_list(1)[1]
-            ll = self.layerList.get_list(2)[np.random.randint(1,4)]
+            ll = self.layerList.get_list(2)[rng.randint(1,4)]
             cl = self.layerList.get_list(4)[0]
             app.env_layers = [osl, dl, ll, cl]
             self.desktop_apps.append(app)
@@ -237,15 +248,27 @@ class ApplicationList(object):
         if ApplicationList.app_num != index:
             raise ValueError(f"The app list length {self.apps.__len__()} is not equal to the total app number {index}")
     
-    def get_arbitrary_data(self, app_type=-1):
+    def init_apps_from_specs(self, app_specs):
+        for index, (size, type, layer_ids) in enumerate(app_specs):
+            app = Application(index, size, type)
+            app.env_layers = [self.layerList.get_data_by_id(i) for i in layer_ids]
+            self.get_list(app.type - 10).append(app)
+        
+        self.apps = self.process_apps + self.storage_apps + self.desktop_apps
+        ApplicationList.app_num = self.apps.__len__()
+        if [app.id for app in self.apps] != list(range(ApplicationList.app_num)):
+            raise ValueError("The app specs should be sorted by type like init_apps does.")
+    
+    def get_arbitrary_data(self, app_type=-1, stream='placement'):
         '''get an application from the list
         app_type indicates the application type: 0-processing, 1-storage, 2-desktop (default -1 to random in the whole list)
         storage app (1) only return the fixed result
+        stream is the random stream drawing it: 'placement' when distributing apps, 'tasks' when a task requires one
         '''
         applist = self.get_list(app_type)
         num = applist.__len__()
         
-        index = np.random.randint(0, num)
+        index = self.streams.get(stream).randint(0, num)
         return applist[index]
 
     def get_next_data(self, data):
@@ -0,0 +1,54 @@
+import numpy as np
+from .app import *
+
+class Catalog(object):
+    def __init__(self, layerList: LayerList=None, appList: ApplicationList=None, seed=None):
+        '''Immutable description of all container layers and applications
+        build it once in the parent process, then every environment of the worker processes rebuilds its
+        own LayerList & ApplicationList from it (hosts are per environment) without random draws
+        
+        seed: draw the apps from the 'apps' stream of this seed, i.e. the catalog an environment with
+            rng_streams and the same seed draws by itself (default the global np.random state)
+        '''
+        self.seed = seed
+        if layerList is None:
+            layerList = LayerList()
+        if appList is None:
+            appList = ApplicationList(layerList, streams=RandomStreams(seed) if seed is not None else None)
+        
+        self.layer_size = np.array([layer.size for layer in layerList.get_list()], dtype=np.float64)
+        self.layer_type = np.array([layer.type for layer in layerList.get_list()], dtype=np.int64)
+        self.app_size = np.array([app.size for app in appList.get_list()], dtype=np.float64)
+        self.app_type = np.array([app.type for app in appList.get_list()], dtype=np.int64)
+        self.app_layers = tuple(tuple(layer.id for layer in app.env_layers) for app in appList.get_list())
+        for array in [self.layer_size, self.layer_type, self.app_size, self.app_type]:
+            array.setflags(write=False)
+    
+    def reproduces(self, config):
+        '''whether an environment of the config would draw this catalog by itself
+        without rng_streams the catalog is drawn from the global np.random state, which the environment
+        keeps drawing from afterwards: sharing a catalog then shifts all its later draws
+        '''
+        return bool(config.get('rng_streams', 0)) and self.seed == config.get('seed')
+    
+    def build_lists(self, streams: RandomStreams=None):
+        '''
+        returns fresh (LayerList, ApplicationList) with the catalog's layers & applications
+        streams: random streams of the environment picking layers & apps from the lists
+        '''
+        layerList = LayerList(streams)
+        if not np.array_equal(self.layer_size, [layer.size for layer in layerList.get_list()]):
+            raise ValueError("The catalog does not match the layers defined in LayerList.")
+        app_specs = [(float(self.app_size[i]), int(self.app_type[i]), self.app_layers[i]) for i in range(len(self.app_size))]
+        return layerList, ApplicationList(layerList, app_specs, streams)
+
+
+_shared_catalog: Catalog = None
+
+def set_shared_catalog(catalog: Catalog):
+    '''used as the initializer of pool workers, or in the parent before forking them'''
+    global _shared_catalog
+    _shared_catalog = catalog
+
+def get_shared_catalog():
+    return _shared_catalog
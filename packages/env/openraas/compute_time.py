@@ -0,0 +1,111 @@
+import heapq
+from .device import *
+
+
+class ProcessorSharingClock(object):
+    def __init__(self):
+        '''Virtual clock of a compute worker running its process tasks under processor sharing
+        the capacity is shared equally by the n running tasks, so the virtual time (the service attained by
+        every running task) advances at capacity / n, and a task of work W arriving at virtual time V
+        leaves when the virtual time reaches its tag V + W, whatever arrives in between
+        only arrivals & departures move the clock, O(log n) each, the completion time of an arrival is a pass over the
+        n running tasks
+        '''
+        self.reset()
+
+    def reset(self):
+        self.now = 0.           # time of the last event after the begin of the slot (ms)
+        self.virtual = 0.       # service attained by every running task (GFLOP)
+        self.capacity = 0.      # shared computation capability (GigaFlops)
+        self.held = 0.          # cpu of the tasks added in this slot
+        self.tags = []          # heap of the finish tags of the running tasks
+
+    def advance(self, time):
+        '''move the clock to time, letting the tasks whose tag is reached leave'''
+        while len(self.tags) and self.now < time:
+            rate = max(self.capacity, 1e-6) / len(self.tags) / 1000.   # GFLOP per ms per task
+            departure = self.now + (self.tags[0] - self.virtual) / rate
+            if departure > time:
+                self.virtual += (time - self.now) * rate
+                break
+            self.now = departure
+            self.virtual = heapq.heappop(self.tags)
+        self.now = max(self.now, time)
+
+    def add(self, time, work, capacity):
+        '''start a task of work (GFLOP) at time, on a shared capability of capacity (GigaFlops)
+
+        Returns:
+            end_time (float): completion time of the task if nothing else arrives (ms), a lower bound since later
+                arrivals share the capacity too and only delay it
+        '''
+        self.advance(time)
+        self.capacity = capacity
+        tag = self.virtual + work
+        heapq.heappush(self.tags, tag)
+
+        # until the task leaves every running task attains the same service, up to its own tag if it leaves before,
+        # so the capacity has to serve the service left to the tag of each one of them
+        work_left = sum(min(t, tag) - self.virtual for t in self.tags)
+        return self.now + work_left / max(capacity, 1e-6) * 1000.
+
+
+class ComputeTimeModel(object):
+    def __init__(self, work=1.):
+        '''Completion times of the process tasks, with a processor sharing clock per compute worker
+        the clocks restart every slot, as the occupied times of the links, since process tasks live one slot
+
+        Args:
+            work (float): computation of a process task per GigaFlops it requests (GFLOP),
+                i.e. its run time in seconds alone on a capability equal to its cpu
+        '''
+        self.work = work
+        self.clocks = {}        # key: device id, value: ProcessorSharingClock of the devices used in this slot
+        self.reset()
+
+    def reset(self):
+        self.clocks.clear()
+        self.tasks = 0
+        self.completion_time = 0.
+        self.slowdown = 0.
+
+    def step(self):
+        self.clocks.clear()
+
+    def complete(self, compute: Device, task, arrival):
+        '''called when the process task is composed on compute, before the allocation
+
+        Args:
+            arrival (float): time its computation can start, after its layers are fetched (ms)
+
+        Returns:
+            completion_time (float): time from arrival to the end of its computation (ms), a lower bound as the tasks
+                composed later on the worker are not taken into account
+        '''
+        clock = self.clocks.get(compute.id)
+        if clock is None:
+            clock = self.clocks[compute.id] = ProcessorSharingClock()
+        # the tasks are composed one by one, a task arriving before the last event waits for it
+        start = max(arrival, clock.now)
+        # the spare capability (the task not allocated yet) plus the one held by the process tasks of this slot
+        capacity = compute.cpu + clock.held
+        clock.held += task.cpu
+        work = task.cpu * self.work
+        end_time = clock.add(start, work, capacity)
+        completion_time = end_time - arrival
+
+        self.tasks += 1
+        self.completion_time += completion_time
+        self.slowdown += completion_time / (work / max(capacity, 1e-6) * 1000.)
+        return completion_time
+
+    def summary(self):
+        '''
+        Returns (dict):
+            compute/completion_time: mean time from the arrival to the end of the computation of a process task (ms)
+            compute/slowdown: mean completion time over the time alone on the worker
+        '''
+        return {
+            'compute/completion_time': self.completion_time / self.tasks if self.tasks else 0.,
+            'compute/slowdown': self.slowdown / self.tasks if self.tasks else 0.,
+        }
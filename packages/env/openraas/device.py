@@ -1,10 +1,46 @@
 import numpy as np
 from .task import *
 from .app import *
+from .rng import *
 import math
 
+class ResourceLedger(object):
+    def __init__(self, workers, M):
+        '''Sums of the capacity & remaining resources (cpu, mem, bw) of the workers counted in the utilization census
+        group 0: servers (id < M), all resources
+        group 1: other workers, cpu if fixed & open, mem if fixed, bandwidth is not counted
+        devices push every change of their remaining resources here, so reading the sums is O(1)
+        '''
+        self.workers = workers
+        for device in workers:
+            device.ledger_group = 0 if device.id < M else 1
+            if device.ledger_group == 0:
+                device.ledger_census = [True, True, True]
+            else:
+                device.ledger_census = [not device.isMobile and device.isOpen, not device.isMobile, False]
+            device.ledger = self
+        self.resync()
+    
+    def resync(self):
+        '''recompute the sums from the devices, which drops the accumulated rounding errors'''
+        self.capacity = [[0., 0., 0.], [0., 0., 0.]]
+        self.remaining = [[0., 0., 0.], [0., 0., 0.]]
+        for device in self.workers:
+            g = device.ledger_group
+            resources = [device.cpu, device.mem, device.bw]
+            for i in range(3):
+                if device.ledger_census[i]:
+                    self.capacity[g][i] += device.capacity[i]
+                    self.remaining[g][i] += resources[i]
+    
+    def used(self, group, resource_type):
+        return self.capacity[group][resource_type] - self.remaining[group][resource_type]
+
+
 class Device(object):
-    def __init__(self, id, cpu, mem, bw, isOpen, isMobile):
+    def __init__(self, id, cpu, mem, bw, isOpen, isMobile, streams: RandomStreams=None):
+        self.ledger: ResourceLedger = None  # set when the device is counted in the utilization census
+        self.streams = streams or UNSEEDED  # random streams of the environment
         self.id = id                # Identification number, should be unique
         self.capacity = [cpu, mem, bw]
         self.isOpen = isOpen        # Whether the operating system is open to developers or not
@@ -17,18 +53,19 @@ class Device(object):
         
         self.caching_files_id = []
         
-        self.req_tasks: list[ProcessTask] = [] # only used when it is a client
+        self.req_tasks = TaskSet() # only used when it is a client
         self.new_tasks: list[ProcessTask] = []
         
-        self.cal_tasks: list[ProcessTask] = []         # serve as a compute worker
-        self.metaos_tasks: list[StorageTask] = []      # serve as a filestore worker
-        self.image_tasks: list[DesktopTask] = []       # serve as a depository worker        
+        self.cal_tasks = TaskSet()         # serve as a compute worker
+        self.metaos_tasks = TaskSet()      # serve as a filestore worker
+        self.image_tasks = TaskSet()       # serve as a depository worker        
         self.reset()
         
         self.is_client = False
         self.is_worker = True
         self.worker_type = 0
-        self.p_coef = [(np.random.randint(50, 100) / 100.), (np.random.randint(50, 100) / 100. / 1000.), (np.random.randint(50, 100) / 100.) ]  # p_coef = [0.5, 1]
+        rng = self.streams.get('devices')
+        self.p_coef = [(rng.randint(50, 100) / 100.), (rng.randint(50, 100) / 100. / 1000.), (rng.randint(50, 100) / 100.) ]  # p_coef = [0.5, 1]
         # TODO: design how to charge
         
         self.debug_mode = False
@@ -59,6 +96,38 @@ class Device(object):
         for data in self.layers+self.apps:
             self.mem -= data.size
     
+    # the remaining resources are properties so that every change reaches the ledger
+    
+    @property
+    def cpu(self):
+        return self._cpu
+    
+    @cpu.setter
+    def cpu(self, value):
+        if self.ledger is not None and self.ledger_census[0]:
+            self.ledger.remaining[self.ledger_group][0] += value - self._cpu
+        self._cpu = value
+    
+    @property
+    def mem(self):
+        return self._mem
+    
+    @mem.setter
+    def mem(self, value):
+        if self.ledger is not None and self.ledger_census[1]:
+            self.ledger.remaining[self.ledger_group][1] += value - self._mem
+        self._mem = value
+    
+    @property
+    def bw(self):
+        return self._bw
+    
+    @bw.setter
+    def bw(self, value):
+        if self.ledger is not None and self.ledger_census[2]:
+            self.ledger.remaining[self.ledger_group][2] += value - self._bw
+        self._bw = value
+    
     def step(self):
         '''step into next time slot'''
         # 1. clear instant cache of the last slot
@@ -67,7 +136,7 @@ class Device(object):
         if False:
             # 2. update work load
             # be care the self.mem is prepared for OpenRaaS, and cannot be occupied by internal processes
-            cpu_offset = self.capacity[0] * (0.1 * np.random.randn(1)[0])   # -0.3 ~ 0.3 of cpu capacity
+            cpu_offset = self.capacity[0] * (0.1 * self.streams.get('devices').randn(1)[0])   # -0.3 ~ 0.3 of cpu capacity
             new_cpu = np.clip(self.cpu+cpu_offset, 0., self.capacity[0]-self.external_cpu_occupation())
             self.inner_cpu += self.cpu - new_cpu
             self.cpu = new_cpu
@@ -116,6 +185,19 @@ class Device(object):
         # resource changes
         self.mem += layer.size
     
+    def remove_app(self, app):
+        if app not in self.apps:
+            raise ValueError(f"The app {app.id} does not exist in this device {self.id}.")
+        self.apps.remove(app)
+        app.remove_host(self.id)
+        # resource changes
+        self.mem += app.size
+    
+    def refresh_timer(self, index):
+        # negative timers never run out: layers of servers and the ones pinned by an edge cache
+        if self.timers[index] >= 0:
+            self.timers[index] = self.default_timer
+    
     def check_layer_timeout(self):
         timeout_layer_index = []
         for i in range(self.timers.__len__()):
@@ -171,7 +253,7 @@ class Device(object):
         elif microservice_type == 1:
             if task.type == 1:
                 # in a storage task, filestore worker is used to contain user upload data
-                if self.isMobile == True or task.mem > self.mem:
+                if self.isMobile == True or task.stored_size() > self.mem:
                     ans = False
             # app check
             else:
@@ -218,12 +300,12 @@ class Device(object):
                     self.fetch_layer(layer)
                 else:
                     # self.refresh_layer_timers(layer=layer)
-                    self.timers[self.layers.index(layer)] = self.default_timer
+                    self.refresh_timer(self.layers.index(layer))
         
         elif microservice_type == 1:
             if task.type == 1:
                 # in a storage task, filestore worker is used to contain user upload data
-                self.mem -= task.mem
+                self.mem -= task.stored_size()
                 for fid in task.files_id:
                     self.caching_files_id.append(fid)
 
@@ -232,7 +314,7 @@ class Device(object):
                 if self.layers[i].id == layer_id:
                     local_index = i
                     break
-            self.timers[local_index] = self.default_timer
+            self.refresh_timer(local_index)
     
     def release_task(self, microservice_type, task):
         '''release a target task from list
@@ -254,7 +336,7 @@ class Device(object):
         elif microservice_type == 1:
             if task.type == 1:
                 # in a storage task, filestore worker is used to contain user upload data
-                self.mem += task.mem
+                self.mem += task.stored_size()
                 for fid in task.files_id:
                     self.caching_files_id.remove(fid)
         # elif microservice_type == 2:
@@ -346,7 +428,7 @@ class Device(object):
             if self.id != task.get_provider(0):
                 bw += task.bandwidth(1)
             if task.type == 1:
-                mem += task.mem
+                mem += task.stored_size()
         for task in self.image_tasks:
             if self.id != task.get_provider(0):
                 bw += task.bandwidth(2)
@@ -372,13 +454,13 @@ class Device(object):
     
     
 class Server(Device):
-    def __init__(self, id):
+    def __init__(self, id, streams: RandomStreams=None):
         cpu = 50.
         mem = 1e6
         bw = 1e3/8
         isOpen = True
         isMobile = False
-        super().__init__(id, cpu, mem, bw, isOpen, isMobile)
+        super().__init__(id, cpu, mem, bw, isOpen, isMobile, streams)
         self.default_timer = -1 # do not release any layer
     
     def print_type(self):
@@ -386,28 +468,30 @@ class Server(Device):
 
 
 class Client(Device):
-    def __init__(self, id, cpu, mem, bw, isOpen, isMobile):
-        super().__init__(id, cpu, mem, bw, isOpen, isMobile)
-        self.is_worker = True if np.random.randint(0, 10) < 2 else False    # 20% to be a worker    # change in environment.py
+    def __init__(self, id, cpu, mem, bw, isOpen, isMobile, streams: RandomStreams=None):
+        super().__init__(id, cpu, mem, bw, isOpen, isMobile, streams)
+        self.is_worker = True if self.streams.get('devices').randint(0, 10) < 2 else False    # 20% to be a worker    # change in environment.py
         self.is_client = True
         self.task_type = -1
+        self.auto_generate = True   # False when the environment generates tasks of all clients in batch
     
     def generate_task(self):
         task_type = self.task_type
         if task_type == -1:
-            r = np.random.randint(0,100)    # 1:6:3
+            r = self.streams.get('tasks').randint(0,100)    # 1:6:3
             if r < 10:
                 task_type = 0
             elif r < 70:
                 task_type = 1
             else:
                 task_type = 2
+        rng = self.streams.get('tasks')
         if task_type == 0:
-            task = ProcessTask(self.id)
+            task = ProcessTask(self.id, rng)
         elif task_type == 1:
-            task = StorageTask(self.id)
+            task = StorageTask(self.id, rng)
         elif task_type == 2:
-            task = DesktopTask(self.id, self.bw)
+            task = DesktopTask(self.id, self.bw, rng)
         self.new_tasks.append(task)
     
     def reset(self):
@@ -418,44 +502,50 @@ class Client(Device):
         super().step()
         # generate new tasks
         self.new_tasks.clear()
-        if np.random.randint(0,10) < 10:     # 100% chance to gain a new requirement
+        if self.auto_generate and self.streams.get('tasks').randint(0,10) < 10:     # 100% chance to gain a new requirement
             self.generate_task()
 
 
 class Desktop(Client):
-    def __init__(self, id):
-        cpu = round(max(20 + 5 * np.random.randn(1)[0], 5.))      # 11 ~ 29
-        mem = round(max(2e5 + 2e5 * np.random.randn(1)[0], 1e5))  # 21e3 ~ 39e3
-        bw = round(max(300 + 70 * np.random.randn(1)[0], 10.))/8   # (90 ~ 510)/8 MBps
-        isOpen = np.random.randint(0,10) < 9            # 90% devices are open
+    def __init__(self, id, streams: RandomStreams=None):
+        streams = streams or UNSEEDED
+        rng = streams.get('devices')
+        cpu = round(max(20 + 5 * rng.randn(1)[0], 5.))      # 11 ~ 29
+        mem = round(max(2e5 + 2e5 * rng.randn(1)[0], 1e5))  # 21e3 ~ 39e3
+        bw = round(max(300 + 70 * rng.randn(1)[0], 10.))/8   # (90 ~ 510)/8 MBps
+        isOpen = rng.randint(0,10) < 9            # 90% devices are open
         isMobile = False
-        super().__init__(id, cpu, mem, bw, isOpen, isMobile)
+        super().__init__(id, cpu, mem, bw, isOpen, isMobile, streams)
     
     def print_type(self):
         return 'desktop'
 
 
 class MobileDevice(Client):
-    def __init__(self, id):
-        cpu = round(max(5 + 3 * np.random.randn(1)[0], 1.))       # 2 ~ 8
-        mem = round(max(3e4 + 3e4 * np.random.randn(1)[0], 1e4))  # 4e3 ~ 16e3
-        bw = round(max(300 + 70 * np.random.randn(1)[0], 10.))/8   # (90 ~ 510)/8 MBps
-        isOpen = np.random.randint(0,10) < 3            # 30% devices are open
+    def __init__(self, id, streams: RandomStreams=None):
+        streams = streams or UNSEEDED
+        rng = streams.get('devices')
+        cpu = round(max(5 + 3 * rng.randn(1)[0], 1.))       # 2 ~ 8
+        mem = round(max(3e4 + 3e4 * rng.randn(1)[0], 1e4))  # 4e3 ~ 16e3
+        bw = round(max(300 + 70 * rng.randn(1)[0], 10.))/8   # (90 ~ 510)/8 MBps
+        isOpen = rng.randint(0,10) < 3            # 30% devices are open
         isMobile = True
-        super().__init__(id, cpu, mem, bw, isOpen, isMobile)
+        super().__init__(id, cpu, mem, bw, isOpen, isMobile, streams)
     
     def print_type(self):
         return 'mobile device'
 
 
 class IoTDevice(Client):
-    def __init__(self, id):
-        cpu = round(max(5 + 3 * np.random.randn(1)[0], 1.))       # 2 ~ 8
-        mem = round(max(1e4 + 2e4 * np.random.randn(1)[0], 1e4))   # 2e3 ~ 8e3
-        bw = round(max(100 + 30 * np.random.randn(1)[0], 10.))/8   # (10 ~ 190)/8 MBps
-        isOpen = np.random.randint(0,10) < 9            # 90% devices are open
-        isMobile = np.random.randint(0,10) < 3          # 30% devices are mobile
-        super().__init__(id, cpu, mem, bw, isOpen, isMobile)
+    def __init__(self, id, streams: RandomStreams=None):
+        streams = streams or UNSEEDED
+        rng = streams.get('devices')
+        cpu = round(max(5 + 3 * rng.randn(1)[0], 1.))       # 2 ~ 8
+        mem = round(max(1e4 + 2e4 * rng.randn(1)[0], 1e4))   # 2e3 ~ 8e3
+        bw = round(max(100 + 30 * rng.randn(1)[0], 10.))/8   # (10 ~ 190)/8 MBps
+        isOpen = rng.randint(0,10) < 9            # 90% devices are open
+        isMobile = rng.randint(0,10) < 3          # 30% devices are mobile
+        super().__init__(id, cpu, mem, bw, isOpen, isMobile, streams)
     
     def print_type(self):
         return 'IoT device'
\ No newline at end of file
@@ -0,0 +1,267 @@
+import numpy as np
+from collections import OrderedDict
+from .device import *
+from .app import *
+from .topology import *
+
+CACHE_POLICIES = ['lru', 'gdsf']
+
+
+class FrequencySketch(object):
+    def __init__(self, width=256, depth=4, sample_size=1000):
+        '''Count-min sketch of the request frequencies, the TinyLFU admission filter
+        all counters are halved every sample_size increments, so that old popularity fades
+
+        Args:
+            width (int): counters per row
+            depth (int): rows, i.e. hash functions
+            sample_size (int): increments between two halvings
+        '''
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.rows = np.arange(depth)
+        # fixed odd multipliers of a multiplicative hash per row
+        self.seeds = np.array([0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F, 0x165667B1, 0xD3A2646D, 0xFD7046C5, 0xB55A4F09][:depth], dtype=np.int64)
+        self.additions = 0
+
+    def index(self, key):
+        return ((key + 1) * self.seeds >> 7) % self.width
+
+    def increment(self, key):
+        self.table[self.rows, self.index(key)] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table >>= 1
+            self.additions //= 2
+
+    def estimate(self, key):
+        return int(self.table[self.rows, self.index(key)].min())
+
+
+class CacheEntry(object):
+    def __init__(self, app: Application, device: Device, size, layers, priority=0.):
+        '''an app filled into the cache of an area
+
+        Args:
+            app (Application): the cached app
+            device (Device): the device holding it
+            size (float): app and layers size (MB)
+            layers (list[ContainerLayer]): layers brought to the device by the fill
+            priority (float): GDSF priority
+        '''
+        self.app = app
+        self.device = device
+        self.size = size
+        self.layers = layers
+        self.priority = priority
+
+
+class EdgeCache(object):
+    def __init__(self, devices, topology: Topology, candidates, policy='lru', admission=True, sketch_width=256, sample_size=1000):
+        '''App caches of the edges of the edge-with-cache model
+        a request is a hit if an edge worker holds its app; on a miss the app and its layers are filled into
+        the area from the closest host (charged on the links, backbones included, as a transmission),
+        evicting cached apps by LRU or GDSF (greedy-dual size frequency) if there is no room,
+        and only if the TinyLFU filter finds the app more frequent than its victims
+
+        Args:
+            devices (list[Device]): all devices, indexed by id
+            topology (Topology): links charged by the fills
+            candidates (list): per area, the edge workers apps are cached on
+            policy (str): eviction policy, see CACHE_POLICIES
+            admission (bool): filter the fills with TinyLFU
+            sketch_width (int): counters per row of the frequency sketches
+            sample_size (int): requests between two halvings of the frequency sketches
+        '''
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown edge cache policy {policy}, expected one of {CACHE_POLICIES}.")
+        self.devices = devices
+        self.topology = topology
+        self.candidates = candidates
+        self.policy = policy
+        self.admission = admission
+        self.sketches = [FrequencySketch(sketch_width, sample_size=sample_size) for _ in candidates]
+        self.entries = [OrderedDict() for _ in candidates]  # per area, key: app id, value: CacheEntry, least recently used first
+        self.inflation = [0. for _ in candidates]           # GDSF clock of every area
+        self.pins = {}      # key: (device id, layer id), value: cached apps of the device using the layer
+        self.reset()
+
+    def reset(self):
+        '''clear the statistics, the cached apps stay on the devices as their other data'''
+        area_num = len(self.candidates)
+        self.requests = np.zeros(area_num, dtype=np.int64)
+        self.hits = np.zeros(area_num, dtype=np.int64)
+        self.requested_size = np.zeros(area_num)
+        self.hit_size = np.zeros(area_num)
+        self.fills = 0
+        self.fill_time = 0.
+        self.evictions = 0
+        self.rejections = 0
+
+    @staticmethod
+    def request_size(app: Application):
+        return app.size + sum(layer.size for layer in app.env_layers)
+
+    def request(self, area_id, app: Application, hit):
+        '''count a request for app from a client of the area
+
+        Args:
+            hit (bool): whether an edge worker of the area holds the app
+
+        '''
+        size = self.request_size(app)
+        self.sketches[area_id].increment(app.id)
+        self.requests[area_id] += 1
+        self.requested_size[area_id] += size
+        if hit:
+            self.hits[area_id] += 1
+            self.hit_size[area_id] += size
+            entry = self.entries[area_id].get(app.id)
+            if entry is not None:
+                self.entries[area_id].move_to_end(app.id)
+                entry.priority = self.priority(area_id, entry)
+
+    def priority(self, area_id, entry: CacheEntry):
+        '''GDSF with a unit cost: H = L + frequency / size, small & popular apps stay longer'''
+        return self.inflation[area_id] + self.sketches[area_id].estimate(entry.app.id) / max(entry.size, 1e-6)
+
+    def fill_size(self, device: Device, app: Application):
+        return app.size + sum(layer.size for layer in app.env_layers if layer not in device.layers)
+
+    def victims(self, area_id, device: Device, size):
+        '''cached apps evicted from device to free size, None if not enough can be freed'''
+        in_use = set(task.app.id for task in device.cal_tasks)
+        entries = [e for e in self.entries[area_id].values() if e.device is device and e.app.id not in in_use]
+        if self.policy == 'gdsf':
+            entries.sort(key=lambda e: e.priority)
+        victims = []
+        free = device.mem
+        for entry in entries:
+            if free >= size:
+                break
+            victims.append(entry)
+            # layers shared with the other apps of the device stay
+            needed = set(layer.id for app in device.apps if app is not entry.app for layer in app.env_layers)
+            free += entry.app.size + sum(layer.size for layer in entry.layers if layer.id not in needed)
+        return victims if free >= size else None
+
+    def fill(self, area_id, app: Application):
+        '''bring a missing app into the area
+
+        Returns (bool): True if it is cached
+        '''
+        best = None
+        for device in self.candidates[area_id]:
+            size = self.fill_size(device, app)
+            victims = self.victims(area_id, device, size)
+            if victims is not None and (best is None or len(victims) < len(best[1])):
+                best = (device, victims, size)
+                if not len(victims):
+                    break
+        if best is None:
+            self.rejections += 1
+            return False
+        device, victims, size = best
+
+        if self.admission and len(victims):
+            frequency = self.sketches[area_id].estimate(app.id)
+            if any(self.sketches[area_id].estimate(v.app.id) >= frequency for v in victims):
+                self.rejections += 1
+                return False
+
+        source = self.closest_host(device, app)
+        if source is None:
+            self.rejections += 1
+            return False
+
+        for victim in victims:
+            self.evict(area_id, victim)
+        size = self.fill_size(device, app)
+        if device.mem < size:
+            # the victims shared more layers than estimated
+            self.rejections += 1
+            return False
+
+        # the fill is transmitted from the closest host, through the backbones if it is in another area
+        latency = self.topology.get_link_states_between_devices(device, source)[1]
+        end_time = self.topology.transmit_task_between_devices(device, source, size)
+        self.fill_time += latency + (end_time if end_time is not None else 0.)
+        self.fills += 1
+
+        layers = [layer for layer in app.env_layers if layer not in device.layers]
+        device.store_data(app)
+        for layer in layers:
+            device.store_data(layer)
+        self.pin(device, app)
+
+        entry = CacheEntry(app, device, size, layers)
+        entry.priority = self.priority(area_id, entry)
+        self.entries[area_id][app.id] = entry
+        return True
+
+    def closest_host(self, device: Device, app: Application):
+        '''the device holding app & its layers with the earliest link'''
+        source = None
+        min_begin_time = 1e6
+        for d_id in app.hosts:
+            host = self.devices[d_id]
+            if host is device or not all(layer in host.layers for layer in app.env_layers):
+                continue
+            begin_time = self.topology.get_link_occupied_time(device, host)
+            if begin_time < min_begin_time:
+                source = host
+                min_begin_time = begin_time
+        return source
+
+    def pin(self, device: Device, app: Application):
+        '''the cache decides when the layers of a cached app leave, not the timers of the device'''
+        for layer in app.env_layers:
+            key = (device.id, layer.id)
+            self.pins[key] = self.pins.get(key, 0) + 1
+            device.timers[device.layers.index(layer)] = -1
+
+    def unpin(self, device: Device, app: Application):
+        '''give the layers no other cached app of the device uses back to the timers of the device'''
+        for layer in app.env_layers:
+            key = (device.id, layer.id)
+            self.pins[key] -= 1
+            if self.pins[key] == 0:
+                del self.pins[key]
+                if layer in device.layers:
+                    device.timers[device.layers.index(layer)] = device.default_timer
+
+    def evict(self, area_id, entry: CacheEntry):
+        device = entry.device
+        device.remove_app(entry.app)
+        self.unpin(device, entry.app)
+        needed = set(layer.id for app in device.apps for layer in app.env_layers)
+        for layer in entry.layers:
+            if layer.id not in needed and layer in device.layers:
+                device.remove_layer(layer)
+        del self.entries[area_id][entry.app.id]
+        if self.policy == 'gdsf':
+            self.inflation[area_id] = entry.priority
+        self.evictions += 1
+
+    def summary(self):
+        '''
+        Returns (dict):
+            cache/hit_ratio, cache/byte_hit_ratio: over all areas
+            cache/area{i}/hit_ratio, cache/area{i}/byte_hit_ratio: of every area with requests
+            cache/fills, cache/evictions, cache/rejections: fills done, apps evicted, misses left unfilled
+            cache/fill_time: mean transmission time of a fill (ms)
+        '''
+        logs = {
+            'cache/hit_ratio': self.hits.sum() / self.requests.sum() if self.requests.sum() else 0.,
+            'cache/byte_hit_ratio': self.hit_size.sum() / self.requested_size.sum() if self.requested_size.sum() else 0.,
+            'cache/fills': self.fills,
+            'cache/evictions': self.evictions,
+            'cache/rejections': self.rejections,
+            'cache/fill_time': self.fill_time / self.fills if self.fills else 0.,
+        }
+        for area_id in np.flatnonzero(self.requests):
+            logs[f'cache/area{area_id}/hit_ratio'] = self.hits[area_id] / self.requests[area_id]
+            logs[f'cache/area{area_id}/byte_hit_ratio'] = self.hit_size[area_id] / self.requested_size[area_id]
+        return logs
@@ -1,12 +1,21 @@
 # alpha v0.2
 
 import traceback
+import heapq
 import numpy as np
 from .device import *
 from .app import *
 from .task import *
 from .topology import *
-from gym import spaces
+from .task_table import *
+from .catalog import *
+from .workload_trace import *
+from .prefetch import *
+from .edge_cache import *
+from .compute_time import *
+from .rng import *
+from ...utils.statistics import QoSStatistics, StorageStatistics
+from ...utils.profiler import create_profiler, NULL_PROFILER
 
 def add_all_layers_of_app(device: Device, app: Application):
     totalsize = 0.
@@ -26,27 +35,63 @@ def add_all_layers_of_app(device: Device, app: Application):
         return True
     return False
 
+def get_spaces(config):
+    """build the observation & action spaces described by the config
+
+    Returns:
+        observation_space (spaces.Box): task info + compute info (2) + candidates number (1) + candidates info
+        action_space (spaces.Discrete): index of the chosen filestore candidate, -1 drops the task
+    """
+    # gym is only needed by RL code asking for the spaces, not by the simulation
+    from gym import spaces
+    
+    state_len = config['task_info_num']+2+1+config['candidates_num']*config['filestore_info_num']
+    observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(state_len,), dtype=np.float64)
+    action_space = spaces.Discrete(config['candidates_num']+1, start=-1)
+    return observation_space, action_space
+
 class Environment(object):
     def __init__(self, config={}):
         self.devices: list[Device] = []       # first M devices are servers -> self.devices[0:M]
         self.workers: list[Device] = []
         # scheduled_tasks stores tasks delivered to workers (in execution ones), while new_tasks stores just generated ones in this slot
         # these two taks lists cannot store any tasks in common or out-of-lifetime ones
-        self.scheduled_tasks: list[Task] = []
+        self.scheduled_tasks = ScheduledTaskStore()
         self.new_tasks: list[Task] = []
         self.fs_candidates = [] # filestore worker candidates in a slot
 
-        self.layerList = LayerList()
-        self.appList = ApplicationList(self.layerList)
+        self.streams = RandomStreams()  # random streams of this environment, handed to all its components
+        if len(config):
+            self.seed_streams(config)
+        catalog = get_shared_catalog()
+        if catalog is not None and (catalog.reproduces(config) or not config.get('rng_streams', 0)):
+            # with rng_streams, a catalog of another seed is not shared so that the results match standalone runs
+            self.layerList, self.appList = catalog.build_lists(self.streams)
+        else:
+            self.layerList = LayerList(self.streams)
+            self.appList = ApplicationList(self.layerList, streams=self.streams)
+        self.task_factory: TaskFactory = None   # generates all tasks of a slot in batch if config['batched_task_generation']
+        self.task_source = None     # replays the tasks of every slot from a trace if config['replay_workload'] or config['external_trace']
+        self.trace_writer: WorkloadTraceWriter = None   # records the tasks of every slot if config['record_workload']
+        self.prefetcher: LayerPrefetcher = None     # pushes popular layers to idle workers between slots if config['prefetch']
+        self.edge_cache: EdgeCache = None           # admission & eviction of the edge caches of cloud model 5 if config['edge_cache']
         
         # logs
-        self.finished_tasks_qos = []    # [[start_delay, service_latency, speed, jilter], ...]
+        self.qos_stats = QoSStatistics()    # streaming start_delay, service_latency, speed, jilter of served tasks
+        self.storage_stats: StorageStatistics = None    # overhead of the redundant user data if replicated or erasure coded
+        self.compute_time: ComputeTimeModel = None      # processor sharing completion times of the process tasks if config['compute_time_model']
+        self.prof = NULL_PROFILER           # per-phase timers of the hot paths if config['profile']
+        self.recorder = None                # records every decision in step() if set, see utils.golden_trace
+        self._spaces = None                 # (observation_space, action_space) built on first access
 
         if len(config):
             self.load_config(config)
     
     def load_config(self, config):
         self.config = config
+        self.seed_streams(config)
+        self.qos_stats.cloud_model = self.cloud_model_type()
+        self.prof = create_profiler(config)
         try:
             self.M = config['M']
             self.N = config['N']
@@ -54,30 +99,92 @@ class Environment(object):
             self.task_info_num = config['task_info_num']
             self.compute_type_num = config['compute_type_num']
             self.filestore_info_num = config['filestore_info_num']
-            self.topology = Topology(config['area_num'])
+            self.topology = Topology(config['area_num'], self.streams)
             if 'center' in self.cloud_model_type():
                 self.topology.set_cloud()
         except:
             raise KeyError("Cannot find environment keys in config dict.")
         
         self.state_len = self.task_info_num+2+1+self.candidates_num*self.filestore_info_num
+        self.layer_sources_num = config.get('parallel_layer_sources', 1)    # depositories a missing layer is split across
+        self.replicas_num = config.get('storage_replicas', 1)   # filestores storing the user data of a storage task
+        self.replica_quorum = config.get('replica_quorum', 0) or self.replicas_num  # replicas an upload waits for
+        if not 1 <= self.replica_quorum <= self.replicas_num:
+            raise ValueError(f"The replica quorum {self.replica_quorum} is out of [1, {self.replicas_num}].")
+        self.erasure_k = config.get('erasure_k', 0)     # data fragments of erasure-coded user data, 0 for whole copies
+        self.erasure_m = config.get('erasure_m', 0)     # parity fragments
+        if self.erasure_k:
+            if self.replicas_num > 1:
+                raise ValueError("Storage replicas and erasure coding cannot be combined.")
+            # every fragment needs its own filestore among the candidates, get_state keeps at most 10 of them
+            fragments_max = min(self.candidates_num, 10)
+            if self.erasure_k < 1 or self.erasure_m < 0 or self.erasure_k + self.erasure_m > fragments_max:
+                raise ValueError(f"The erasure coding k={self.erasure_k} m={self.erasure_m} needs k >= 1, m >= 0 and k + m <= {fragments_max} filestore candidates.")
+            # every fragment is written before the upload ends
+            self.extra_filestores_num = self.erasure_k + self.erasure_m - 1
+            self.upload_quorum = self.erasure_k + self.erasure_m
+        else:
+            self.extra_filestores_num = self.replicas_num - 1
+            self.upload_quorum = self.replica_quorum
+        self.storage_stats = StorageStatistics() if self.replicas_num > 1 or self.erasure_k else None
+        self.compute_time = ComputeTimeModel(config.get('compute_work', 1.)) if config.get('compute_time_model', 0) else None
+        self._spaces = None
+        if config.get('batched_task_generation', 0):
+            self.task_factory = TaskFactory(self.appList, self.streams)
+        if config.get('replay_workload', ''):
+            self.task_source = WorkloadTraceReader(config['replay_workload'], self.appList, self.M, self.N)
+        elif config.get('external_trace', ''):
+            self.task_source = ColumnarTraceSource(config['external_trace'], TaskFactory(self.appList, self.streams), self.M, self.N,
+                                                   config.get('external_trace_slot_length', 1.),
+                                                   config.get('external_trace_fields', None),
+                                                   config.get('external_trace_scale', None),
+                                                   config.get('external_trace_types', None))
+        if config.get('record_workload', ''):
+            self.trace_writer = WorkloadTraceWriter(config['record_workload'], self.M, self.N)
         self.generate_topology()
         self.reset()
     
+    @property
+    def observation_space(self):
+        if self._spaces is None:
+            self._spaces = get_spaces(self.config)
+        return self._spaces[0]
+    
+    @property
+    def action_space(self):
+        if self._spaces is None:
+            self._spaces = get_spaces(self.config)
+        return self._spaces[1]
+    
     def reset(self):
         self.scheduled_tasks.clear()
         self.new_tasks.clear()
         self.fs_candidates.clear()
 
-        self.finished_tasks_qos.clear()
+        self.qos_stats.reset()
+        self.prof.reset()
+        if self.storage_stats is not None:
+            self.storage_stats.reset()
+        if self.prefetcher is not None:
+            self.prefetcher.reset()
+        if self.edge_cache is not None:
+            self.edge_cache.reset()
+        if self.compute_time is not None:
+            self.compute_time.reset()
         
         self.task_index = 0
+        self.slot = 0   # increased in every next()
         
         for device in self.devices:
             device.reset()
         
         self.topology.reset()
         
+        if self.task_source is not None:
+            self.task_source.start_episode()
+        if self.trace_writer is not None:
+            self.trace_writer.write_episode()
+        
         self.next()
         state = self.get_state()
         while self.new_tasks[self.task_index].dropped:
@@ -87,8 +194,23 @@ class Environment(object):
             state = self.get_state()
         return state
     
+    def close(self):
+        if self.task_source is not None:
+            self.task_source.close()
+        if self.trace_writer is not None:
+            self.trace_writer.close()
+    
     def seed(self, seed):
         np.random.seed(seed)
+        if self.config.get('rng_streams', 0):
+            self.streams.seed(seed)
+    
+    def seed_streams(self, config):
+        """one independent generator per component derived from config['seed'], or the global np.random state"""
+        if config.get('rng_streams', 0):
+            self.streams.seed(config['seed'])
+        else:
+            self.streams.clear()
     
     def generate_topology(self):
         # In a RL game, maybe we should not reset the topology so that the agent can learn more potential details in its neu-network
@@ -103,7 +225,7 @@ class Environment(object):
         self.devices.clear()
         server_area_id = 0 if 'center' in self.cloud_model_type() else -1
         for i in range(M):
-            device = Server(i)
+            device = Server(i, self.streams)
             self.devices.append(device)
             self.topology.add_device(device, server_area_id)
             self.workers.append(device) # all servers are workers
@@ -111,24 +233,47 @@ class Environment(object):
             i = M + j
             r = np.random.rand(0,3)
             if r == 0:
-                device = Desktop(i)
+                device = Desktop(i, self.streams)
             elif r == 1:
-                device = MobileDevice(i)
+                device = MobileDevice(i, self.streams)
             else:
-                device = IoTDevice(i)
+                device = IoTDevice(i, self.streams)
             device.task_type = self.config['task_type']
+            device.auto_generate = self.task_factory is None and self.task_source is None
             self.devices.append(device)
-            area_id = np.random.randint(1, self.topology.area_num) if server_area_id == 0 else -1
+            area_id = self.streams.get('topology').randint(1, self.topology.area_num) if server_area_id == 0 else -1
             self.topology.add_device(device, area_id)
             
             # change is_worker by config['worker_rate']
-            device.is_worker = True if np.random.randint(0, 100)/100 < self.config['worker_rate'] else False
+            device.is_worker = True if self.streams.get('devices').randint(0, 100)/100 < self.config['worker_rate'] else False
             
             if self.cloud_model_type() == "openraas" and device.is_worker:
                 # only openraas allows a client to be a worker
                 self.workers.append(device)
             
 
+        if self.config.get('bandwidth_index', 0):
+            # the compute candidates of the tasks free to compute anywhere
+            self.topology.enable_bandwidth_index([device.id for device in self.workers if not device.isMobile and device.isOpen])
+
+        if self.config.get('prefetch', 0) and "raas" in self.cloud_model_type():
+            # only the raas models fetch missing layers, the others need workers already holding the app
+            self.prefetcher = LayerPrefetcher(self.devices, self.topology, self.layerList, self.area_workers(),
+                                              self.config.get('prefetch_decay', 0.8),
+                                              self.config.get('prefetch_budget', 1000.),
+                                              self.config.get('prefetch_threshold', 1.))
+        else:
+            self.prefetcher = None
+        
+        if self.config.get('edge_cache', 0) and "cache" in self.cloud_model_type():
+            self.edge_cache = EdgeCache(self.devices, self.topology, self.area_workers(),
+                                        self.config.get('edge_cache_policy', 'lru'),
+                                        self.config.get('edge_cache_admission', 1),
+                                        self.config.get('edge_cache_sketch_width', 256),
+                                        self.config.get('edge_cache_sample_size', 1000))
+        else:
+            self.edge_cache = None
+
         if self.config['debug_mode']:
             self.topology.debug_mode = True
             self.topology.check_areas() # debug
@@ -152,7 +297,7 @@ class Environment(object):
                     if storage_app == data:
                         continue
                         
-                    ori = np.random.randint(0, M)
+                    ori = self.streams.get('placement').randint(0, M)
                     index = ori
                     while not self.workers[index].is_enough_for_storing(data):
                         index = index+1 if index < M-1 else 0
@@ -167,7 +312,7 @@ class Environment(object):
                 for List in [self.layerList, self.appList]:
                     if device.isMobile and List == self.appList:
                         continue
-                    data_num = np.random.randint(1, 19)
+                    data_num = self.streams.get('placement').randint(1, 19)
                     for _ in range(data_num):   
                         # c) data
                         data = List.get_arbitrary_data()
@@ -190,7 +335,7 @@ class Environment(object):
                 if app == storage_app:
                     continue
                 
-                ori = np.random.randint(0, M)
+                ori = self.streams.get('placement').randint(0, M)
                 index = ori
                 worker = self.workers[index]
                 while True:
@@ -206,7 +351,7 @@ class Environment(object):
                 add_all_layers_of_app(device, storage_app)
                 
                 # a) average 10 data in a worker
-                data_num = np.random.randint(1, 19)
+                data_num = self.streams.get('placement').randint(1, 19)
                 for _ in range(data_num):
                     app = List.get_arbitrary_data()
                     ori = app.id
@@ -218,6 +363,9 @@ class Environment(object):
                         if app.id == ori:
                             break
         
+        # utilization sums of the workers, updated on every allocation & release
+        self.ledger = ResourceLedger(self.workers, M)
+        
         if self.config['debug_mode']:
             # debug
             app_num = 0
@@ -226,6 +374,12 @@ class Environment(object):
             print(self.cloud_model_type(), "app_num (server)", app_num)
     
     def next(self):
+        self.next_slot()
+        # an external trace may have no task in a slot: the slots go on, releasing the expired tasks, until one has tasks
+        while self.tasks_num == 0 and self.task_source is not None:
+            self.next_slot()
+    
+    def next_slot(self):
         M, N = self.M, self.N
         
         if self.config['debug_mode']:
@@ -235,6 +389,10 @@ class Environment(object):
                 if err != 0:
                     raise ValueError(f"Error with tag {err} occurs in device {device.id}.")
         
+        prof = self.prof
+        prof.end_slot()
+        prof.mark()
+        
         # 1. clear instant cache of the last slot
         self.new_tasks.clear() 
         self.fs_candidates.clear()
@@ -244,52 +402,80 @@ class Environment(object):
             device.step()
         
         self.topology.step()
-        
-        # 3. update exsiting tasks state
-        # use a list to contain the global tasks, and device.py should not modify any value of a task
-        removed_tasks = []
-        for task in self.scheduled_tasks:
-            task.step()
-            if task.life_time == 0: # out of lifetime
-                removed_tasks.append(task)
-                client = self.devices[task.user_id]
-                compute = self.devices[task.get_provider(0)]
-                filestore = self.devices[task.get_provider(1)]
-                depositories = task.get_provider(2)
-                
-                if task.type == 2:
-                    self.topology.release_bandwidth_between_devices(client, compute, task.bandwidth(0))
-                    self.topology.release_bandwidth_between_devices(compute, filestore, task.bandwidth(1))
-                compute.release_task(0, task)
-                filestore.release_task(1, task)
-                client.req_tasks.remove(task)
-                
-                for d in depositories:
+        if self.compute_time is not None:
+            self.compute_time.step()
+        prof.lap('next.devices', len(self.devices))
+        
+        # 3. release tasks running out of lifetime in this slot
+        # scheduled tasks are bucketed by expiry slot, so only the expiring ones are visited
+        # device.py should not modify any value of a task
+        self.slot += 1
+        expired_tasks = self.scheduled_tasks.pop_expired(self.slot)
+        for task in expired_tasks:
+            client = self.devices[task.user_id]
+            compute = self.devices[task.get_provider(0)]
+            filestore = self.devices[task.get_provider(1)]
+            depositories = task.get_provider(2)
+            
+            if task.type == 2:
+                self.topology.release_bandwidth_between_devices(client, compute, task.bandwidth(0))
+                self.topology.release_bandwidth_between_devices(compute, filestore, task.bandwidth(1))
+            compute.release_task(0, task)
+            filestore.release_task(1, task)
+            for d in task.extra_filestores:
+                self.devices[d].release_task(1, task)
+            client.req_tasks.remove(task)
+            
+            for sources in task.layer_sources:
+                for d in sources:
                     self.devices[d].release_task(2, task)
-                
-        for task in removed_tasks:
-            self.scheduled_tasks.remove(task)
+        prof.lap('next.release', len(expired_tasks))
+        
+        # 3.1 push popular layers to idle workers before the new tasks come
+        if self.prefetcher is not None:
+            self.prefetcher.push()
+            prof.lap('next.prefetch')
         
         # 4. collect new tasks from client devices
-        for j in range(N):
-            i = M + j
-            self.new_tasks += self.devices[i].new_tasks
-        for task in self.new_tasks:
-            if task.app is None:
-                task.app = self.appList.get_arbitrary_data(task.type)
-            # task.app = self.appList.get_data_by_id(task.app_id)
+        if self.task_source is not None:
+            self.new_tasks = self.task_source.next_slot(self.devices[M:M+N])
+            if len(self.new_tasks) and self.new_tasks.user_id.max() >= M+N:
+                raise ValueError(f"The workload trace requires client {self.new_tasks.user_id.max()}, while there are only {M+N} devices.")
+        elif self.task_factory is not None:
+            # tasks (with their apps) are materialized from the table when get_state visits them
+            self.new_tasks = self.task_factory.generate(self.devices[M:M+N])
+        else:
+            for j in range(N):
+                i = M + j
+                self.new_tasks += self.devices[i].new_tasks
+            for task in self.new_tasks:
+                if task.app is None:
+                    task.app = self.appList.get_arbitrary_data(task.type, 'tasks')
+                # task.app = self.appList.get_data_by_id(task.app_id)
+        
+        if self.trace_writer is not None:
+            tasks = self.new_tasks if isinstance(self.new_tasks, TaskTable) else TaskTable.from_tasks(self.new_tasks)
+            self.trace_writer.write_slot(tasks)
         
         self.tasks_num = len(self.new_tasks)
         self.task_index = 0
         self.served_num = 0
+        prof.lap('next.collect', self.tasks_num)
             
     def get_state(self):
+        prof = self.prof
+        prof.mark()
         def dropped_state(task):
+            prof.lap('state.dropped')
             task.dropped = True
             return [-1. for _ in range(self.state_len)]
         self.fs_candidates = []
         task = self.new_tasks[self.task_index]  
         client = self.devices[task.user_id]
+        if self.prefetcher is not None:
+            # in the center models all requests are computed in the cloud area
+            area_id = 0 if "center" in self.cloud_model_type() else self.topology.device_to_area[client.id]
+            self.prefetcher.observe(area_id, task.app)
         
         # 4.1 find the closest worker as compute candidates
         target_c = -1
@@ -298,13 +484,22 @@ class Environment(object):
             workers = []
             edge = self.topology.get_area_by_device(client)
             eds = [self.devices[did] for did in edge.devices]
-            if "center" not in self.cloud_model_type() and self.config['compute_at_edge']:
+            at_edge = "center" not in self.cloud_model_type() and self.config['compute_at_edge']
+            indexed = self.topology.bandwidth_index is not None
+            # desktop tasks of the raas models computing anywhere only visit the workers reachable with enough
+            # bandwidth left, found by range queries on the bandwidth index instead of a scan of all workers
+            ranged = task.type == 2 and indexed and not at_edge and "raas" in self.cloud_model_type()
+            if at_edge:
                 # 仅从边缘提供计算服务
                 for ed in eds:
                     if ed.is_worker and not ed.isMobile and ed.isOpen:
                         if "raas" not in self.cloud_model_type() and ed.id not in task.app.hosts:
                             continue
                         workers.append(ed)
+            elif ranged:
+                client_area = self.topology.device_to_area[client.id]
+                # sorted by id, the order of self.workers, so that ties give the same choice as a scan
+                workers = [self.devices[d_id] for d_id in sorted(self.topology.bandwidth_index.reachable_with(client_area, task.bandwidth(0)))]
             else:
                 # 计算服务可以来自任何地方
                 for worker in self.workers:
@@ -313,6 +508,13 @@ class Environment(object):
                             continue
                         workers.append(worker)
             
+            if self.edge_cache is not None and at_edge:
+                # a hit if an edge worker holds the app, a miss is filled into the edge under admission & eviction
+                self.edge_cache.request(edge.id, task.app, len(workers) > 0)
+                if workers.__len__() == 0:
+                    self.edge_cache.fill(edge.id, task.app)
+                    return dropped_state(task)
+            
             if workers.__len__() == 0:
                 if "cache" in self.cloud_model_type():
                     # 遇到没有的服务，拒绝该请求，但会下载到该边缘的某个设备上
@@ -321,6 +523,7 @@ class Environment(object):
                             break
                 return dropped_state(task)
             
+            prof.count('state.compute', len(workers))
             for device in workers:
                 if device.id == task.user_id or (not device.check_task_availability(0, task)):
                     continue
@@ -337,8 +540,11 @@ class Environment(object):
                 if "raas" not in self.cloud_model_type() and task.mem > device.mem:
                     continue
                 
-                if task.type == 2:
-                    link_bw = self.topology.get_link_states_between_devices(client, device)[0]
+                if task.type == 2 and not ranged:
+                    if indexed:
+                        link_bw = self.topology.get_link_bandwidth_between_devices(client, device)
+                    else:
+                        link_bw = self.topology.get_link_states_between_devices(client, device)[0]
                     if link_bw < task.bandwidth(0):
                         continue
                 
@@ -350,6 +556,7 @@ class Environment(object):
                 #     minn = -s
                     target_c = device.id
         
+        prof.lap('state.compute')
         if target_c == -1:
             # print(f"Task require cpu={task.cpu} mem={task.mem} bw={task.bw if task.type==2 else None}, while max_cpu={np.max([worker.cpu if not worker.isMobile and worker.isOpen else 0. for worker in self.workers])} ") #max_mem={np.max([worker.mem for worker in self.workers])} max_bw={np.max([i.bw for worker in self.workers])}")
             return dropped_state(task)
@@ -384,7 +591,12 @@ class Environment(object):
                             del task.files_mem[i]
                             break
         
+        if task.type == 1 and self.erasure_k and "raas" in self.cloud_model_type():
+            # every filestore only keeps one fragment of the erasure-coded user data
+            task.fragment_size = task.mem / self.erasure_k
+        
         if "raas" in self.cloud_model_type():
+            prof.count('state.filestore', len(task.app.hosts))
             for fs_id in task.app.hosts:
                 device = self.devices[fs_id]
                 
@@ -403,7 +615,10 @@ class Environment(object):
                         continue
                 if device.check_task_availability(1, task):
                     if task.type == 2:
-                        link_bw = self.topology.get_link_states_between_devices(compute, device)[0]
+                        if self.topology.bandwidth_index is not None:
+                            link_bw = self.topology.get_link_bandwidth_between_devices(compute, device)
+                        else:
+                            link_bw = self.topology.get_link_states_between_devices(compute, device)[0]
                         if link_bw < task.bandwidth(1):
                             continue
                         compute_area = self.topology.get_area_by_device(compute)
@@ -415,6 +630,15 @@ class Environment(object):
         else:
             avail_fs.append(target_c)
         
+        if task.fragment_size is not None:
+            # with fewer than k filestores able to keep a fragment, the data is split into fewer & larger fragments
+            while 0 < len(avail_fs) < self.erasure_k:
+                task.fragment_size = task.mem / len(avail_fs)
+                fit = [fs_id for fs_id in avail_fs if self.devices[fs_id].check_task_availability(1, task)]
+                if len(fit) == len(avail_fs):
+                    break
+                avail_fs = fit
+        
         if len(avail_fs) == 0:
             if "raas" in self.cloud_model_type() and self.config['raas_cache']:
                 # 下载 missing app 到某个 filestore
@@ -438,26 +662,33 @@ class Environment(object):
             # only one avail_fs
             self.fs_candidates = avail_fs
         
+        prof.lap('state.filestore')
+        
         # 4.3 find devicces with the target layers as depository candidates
         compute_link = self.topology.get_device_interface_link(compute)
         for layer_id in task.missing_layers:
             layer = self.layerList.get_data_by_id(layer_id)
-            min_estimated_time = 1e6
-            target_d = -1
+            prof.count('state.depository', len(layer.hosts))
+            estimated_times = {}
             for d_id in layer.hosts:
                 if layer in self.devices[d_id].layers:
                     link = self.topology.get_device_interface_link_by_id(d_id)
                     estimated_time = link.occupied_time + layer.size / (min(link.bandwidth, compute_link.bandwidth)+1e6) * 1000
-                    if estimated_time < min_estimated_time:
-                        target_d = d_id
-                        min_estimated_time = estimated_time
+                    if estimated_time < 1e6:
+                        estimated_times[d_id] = estimated_time
             
+            # the top-k closest depositories, the closest one (first met on ties) is the provider of the layer
+            sources = heapq.nsmallest(self.layer_sources_num, estimated_times, key=estimated_times.get)
+            target_d = sources[0] if len(sources) else -1
             task.set_provider(2, target_d)
+            task.layer_sources.append(sources)
             
             if target_d == -1:
                 # if none missing layer, won't get into this loop
                 return dropped_state(task)
         
+        prof.lap('state.depository')
+        
         # 4.4 arrange the observation
         task_info = [task.u_0(), task.qos[1], task.qos[2], task.qos[3]] # the scheduler only decides which filestore to choose, which is only influenced by delay, speed, and jilter
                                                                         # it also decides whether droping this task
@@ -478,10 +709,25 @@ class Environment(object):
         
         task.dropped = False
         state = np.array(task_info+worker_info+candidates_info)
+        prof.lap('state.observation')
         
         return state
     
+    def get_action_mask(self):
+        """valid actions for the current task
+
+        Returns:
+            mask (np.array): bool array with candidates_num+1 elements, mask[i] stands for action i-1 (mask[0] drops the task)
+        """
+        mask = np.zeros(self.candidates_num+1, dtype=bool)
+        mask[0] = True
+        if not self.new_tasks[self.task_index].dropped:
+            mask[1:1+len(self.fs_candidates)] = True
+        return mask
+    
     def step(self, action):
+        self.prof.mark()
+        
         # 1. execute service composition
 
         task = self.new_tasks[self.task_index]
@@ -489,6 +735,7 @@ class Environment(object):
         if not -1 <= action < len(self.fs_candidates):
             raise ValueError(f"Error action {action} is larger than the candidates number {len(self.fs_candidates)}")
         
+        qos = None
         if action == -1 or task.dropped:
             # this task cannot be composed
             task.dropped = True
@@ -501,15 +748,27 @@ class Environment(object):
             compute = self.devices[task.get_provider(0)]
             filestore = self.devices[fs_id]
             depositories = task.get_provider(2)
+            extra_filestores = []
+            if task.type == 1 and self.extra_filestores_num > 0:
+                extra_filestores = [self.devices[d] for d in self.select_filestores(task, compute, filestore, self.extra_filestores_num)]
+                task.extra_filestores = [d.id for d in extra_filestores]
             
             # bidding
             # b-1 estimate utility
             uc_speed, uc_latency, uc_jilter = self.topology.get_link_states_between_devices(client, compute)
             cf_speed, cf_latency, cf_jilter = self.topology.get_link_states_between_devices(compute, filestore)
             cd_latency = 0.
+            chunks = []     # per missing layer, the size downloaded from each of its sources
             for index in range(len(depositories)):
                 depository = self.devices[depositories[index]]
                 layer = self.layerList.get_data_by_id(task.missing_layers[index])
+                if self.layer_sources_num > 1:
+                    # the layer is split across its sources so that all chunks arrive together
+                    sources = [self.devices[d] for d in task.layer_sources[index]]
+                    end_time, layer_chunks = self.topology.plan_parallel_transmission(compute, sources, layer.size)
+                    chunks.append(layer_chunks)
+                    cd_latency = max(cd_latency, end_time)
+                    continue
                 link_latency = self.topology.get_link_states_between_devices(compute, depository)[1]
                 begin_time = self.topology.get_link_occupied_time(compute, depository)
                 duration = self.topology.cal_transmission_duration(compute, depository, layer.size)
@@ -522,12 +781,28 @@ class Environment(object):
                 speed = min(uc_speed, cf_speed)
                 jilter = uc_jilter + cf_jilter
                 service_latency = cf_latency + uc_latency + task.mem / (speed+1e-6) * 1000.
+                if len(extra_filestores) or task.fragment_size is not None:
+                    # replicas or fragments are uploaded in parallel, the upload ends with the quorum-th fastest one
+                    # a fragment link only carries 1/k of the data, so it forwards k times faster
+                    ratio = task.mem / task.fragment_size if task.fragment_size else 1
+                    links = [(cf_speed, cf_latency, cf_jilter)]
+                    links += [self.topology.get_link_states_between_devices(compute, fs) for fs in extra_filestores]
+                    uploads = []
+                    for f_speed, f_latency, f_jilter in links:
+                        f_speed = min(uc_speed, f_speed * ratio)
+                        uploads.append((f_latency + uc_latency + task.mem / (f_speed+1e-6) * 1000., f_speed, uc_jilter + f_jilter))
+                    uploads.sort(key=lambda upload: upload[0])
+                    service_latency, speed, jilter = uploads[min(self.upload_quorum, len(uploads)) - 1]
             else:
                 speed = uc_speed
                 jilter = uc_jilter
                 service_latency = uc_latency
+                if task.type == 0 and self.compute_time is not None:
+                    # the result comes back once the computation, shared with the other tasks of the worker, ends
+                    service_latency += self.compute_time.complete(compute, task, start_delay)
             
-            self.finished_tasks_qos.append([start_delay, service_latency, speed, jilter])
+            qos = (start_delay, service_latency, speed, jilter)
+            self.qos_stats.add(task.type, *qos)
             utility = task.utility(start_delay, service_latency, speed, jilter)
         
             # b-2 estimate cost
@@ -538,7 +813,9 @@ class Environment(object):
                 c_price += compute.unit_price(1) * task.mem
                 # TODO: how to change the fs to use downloading volumn as the charge reference 
             else:
-                fs_price += filestore.unit_price(1) * task.mem
+                fs_price += filestore.unit_price(1) * task.stored_size()
+                for fs in extra_filestores:
+                    fs_price += fs.unit_price(1) * task.stored_size()
             d_price = 0.
             for d in depositories:
                 # d_price += self.devices[d].unit_price(2) * task.bandwidth(2)
@@ -549,13 +826,27 @@ class Environment(object):
             reward = utility - cost
             
             # resource changes
+            if self.prefetcher is not None:
+                self.prefetcher.use(compute, task)
             compute.allocate_tasks(0, task) # we should pre-allocate resource for C and D! and release it no matter whether we execute it or not
             filestore.allocate_tasks(1, task)   # be careful sometimes the c is the f
+            for fs in extra_filestores:
+                fs.allocate_tasks(1, task)
             
             # image fetching should be fromer than file transmission
             for index in range(len(depositories)):
                 depository = self.devices[depositories[index]]
                 layer = self.layerList.get_data_by_id(task.missing_layers[index])
+                if len(chunks):
+                    # only the sources with a non-empty chunk take part in the download
+                    used = []
+                    for d, chunk in zip(task.layer_sources[index], chunks[index]):
+                        if chunk > 0.:
+                            self.devices[d].allocate_tasks(2, task, layer.id)
+                            self.topology.transmit_task_between_devices(compute, self.devices[d], chunk)
+                            used.append(d)
+                    task.layer_sources[index] = used
+                    continue
                 depository.allocate_tasks(2, task, layer.id)
                 # self.topology.occupy_bandwidth_between_devices(compute, depository, task.bandwidth(2))
                 # transmit images
@@ -568,13 +859,24 @@ class Environment(object):
             else:
                 self.topology.transmit_task_between_devices(client, compute, task.mem)  # u -> c
                 if task.type == 1:
-                    self.topology.transmit_task_between_devices(compute, filestore, task.mem)   # u -> c -> f
+                    self.topology.transmit_task_between_devices(compute, filestore, task.stored_size())   # u -> c -> f
+                    for fs in extra_filestores:
+                        self.topology.transmit_task_between_devices(compute, fs, task.stored_size())   # parallel replicas or fragments
+                    if self.storage_stats is not None:
+                        # fewer than k filestores kept a fragment: the data was striped over them without parity
+                        striped = task.fragment_size is not None and round(task.mem / task.fragment_size) < self.erasure_k
+                        self.storage_stats.add(task.mem, task.stored_size() * (1 + len(extra_filestores)),
+                                               not striped and len(extra_filestores) < self.extra_filestores_num, striped)
             
             # add newly executed ones in scheduled_tasks
-            self.scheduled_tasks.append(task)
+            self.scheduled_tasks.add(task, self.slot + task.life_time)
             client.req_tasks.append(task)
             self.served_num += 1
         
+        if self.recorder is not None:
+            self.recorder.record(self, task, action, reward, qos)
+        self.prof.lap('step.commit')
+        
         # 2. get state data
         is_dropped = True
         new_slot = False
@@ -590,6 +892,42 @@ class Environment(object):
             
         return state, reward, new_slot
     
+    def select_filestores(self, task, compute, filestore, num):
+        """the filestore candidates able to store the task, other than the chosen filestore and the compute worker,
+        with the earliest estimated end of the upload
+
+        Args:
+            num (int): number of replicas or fragments to place besides the chosen filestore
+
+        Returns:
+            filestores (list): ids of at most num devices
+        """
+        candidates = np.array([fs_id for fs_id in self.fs_candidates if fs_id != filestore.id and fs_id != compute.id
+                               and self.devices[fs_id].check_task_availability(1, task)], dtype=np.int64)
+        if not len(candidates):
+            return []
+        lines = [self.topology.get_device_interface_link_by_id(fs_id) for fs_id in candidates]
+        bandwidth = np.array([line.bandwidth for line in lines])
+        latency = np.array([line.latency for line in lines])
+        occupied_time = np.array([line.occupied_time for line in lines])
+        
+        compute_bw = self.topology.get_device_interface_link(compute).bandwidth
+        estimated_time = occupied_time + latency + task.stored_size() / (np.minimum(bandwidth, compute_bw)+1e6) * 1000
+        order = np.argsort(estimated_time, kind='stable')[:num]
+        return [int(candidates[i]) for i in order]
+    
+    def area_workers(self):
+        """per area, the open & fixed devices which can compute for its clients, the closest ones first"""
+        at_edge = "center" not in self.cloud_model_type() and self.config['compute_at_edge']
+        workers = set(worker.id for worker in self.workers)
+        candidates = []
+        for area in self.topology.areas:
+            devices = [self.devices[d] for d in area.devices]
+            devices = [d for d in devices if (d.is_worker if at_edge else d.id in workers) and not d.isMobile and d.isOpen]
+            devices.sort(key=lambda d: area.line_of[d.id].latency)
+            candidates.append(devices)
+        return candidates
+    
     def cloud_model_type(self):
         cm = self.config['cloud_model']
         if cm == 0:
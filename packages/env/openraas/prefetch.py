@@ -0,0 +1,121 @@
+import numpy as np
+from .device import *
+from .app import *
+from .topology import *
+
+
+class LayerPrefetcher(object):
+    def __init__(self, devices, topology: Topology, layerList: LayerList, candidates, decay=0.8, budget=1000., threshold=1.):
+        '''Push the layers popular in an area to its idle workers between slots, before tasks ask for them
+        the popularity of a layer in an area is a counter of the requests of apps using it, decayed every slot
+
+        Args:
+            devices (list[Device]): all devices, indexed by id
+            topology (Topology): links used by the pushes
+            layerList (LayerList): all layers
+            candidates (list): per area, the open & fixed workers able to compute for its clients, preferred first
+            decay (float): factor applied to the counters every slot
+            budget (float): layer data pushed per area per slot (MB)
+            threshold (float): minimum decayed request count of a pushed layer
+        '''
+        self.devices = devices
+        self.topology = topology
+        self.layerList = layerList
+        self.candidates = candidates
+        self.decay = decay
+        self.budget = budget
+        self.threshold = threshold
+        self.app_layers = {}    # key: app id, value: ids of its layers
+        self.reset()
+
+    def reset(self):
+        self.counters = np.zeros((len(self.candidates), len(self.layerList.layers)))
+        self.pending = {}       # key: (device id, layer id) pushed but not used yet, value: estimated fetch time it saves (ms)
+        self.pushed = 0
+        self.pushed_size = 0.
+        self.hits = 0
+        self.estimated_saved_time = 0.
+
+    def observe(self, area_id, app: Application):
+        '''count a request of app from a client of the area'''
+        if app.id not in self.app_layers:
+            self.app_layers[app.id] = np.array([layer.id for layer in app.env_layers], dtype=np.int64)
+        self.counters[area_id, self.app_layers[app.id]] += 1.
+
+    def push(self):
+        '''decay the counters, then push the hottest layers to idle workers within the budget of every area'''
+        self.counters *= self.decay
+        # forget the pushed layers released by their timers before any task used them
+        for key in [key for key in self.pending if key[0] not in self.layerList.get_data_by_id(key[1]).hosts]:
+            del self.pending[key]
+        for area_id, workers in enumerate(self.candidates):
+            budget = self.budget
+            for layer_id in np.argsort(-self.counters[area_id], kind='stable'):
+                if self.counters[area_id, layer_id] < self.threshold:
+                    break
+                layer = self.layerList.get_data_by_id(int(layer_id))
+                if layer.size > budget:
+                    continue
+                for worker in workers:
+                    if len(worker.cal_tasks) == 0 and layer not in worker.layers and worker.mem >= layer.size:
+                        if self.push_layer(worker, layer):
+                            budget -= layer.size
+                        break
+
+    def push_layer(self, worker: Device, layer: ContainerLayer):
+        '''transmit the layer to the worker from its closest host
+
+        Returns (bool): False if no device holds the layer
+        '''
+        # the same estimation as the choice of depositories in Environment.get_state
+        worker_link = self.topology.get_device_interface_link(worker)
+        source = None
+        min_estimated_time = 1e6
+        for d_id in layer.hosts:
+            if layer in self.devices[d_id].layers:
+                link = self.topology.get_device_interface_link_by_id(d_id)
+                estimated_time = link.occupied_time + layer.size / (min(link.bandwidth, worker_link.bandwidth)+1e6) * 1000
+                if estimated_time < min_estimated_time:
+                    source = self.devices[d_id]
+                    min_estimated_time = estimated_time
+        if source is None:
+            return False
+
+        latency = self.topology.get_link_states_between_devices(worker, source)[1]
+        duration = self.topology.cal_transmission_duration(worker, source, layer.size)
+        self.topology.transmit_task_between_devices(worker, source, layer.size)
+        worker.fetch_layer(layer)
+
+        self.pending[(worker.id, layer.id)] = latency + duration
+        self.pushed += 1
+        self.pushed_size += layer.size
+        return True
+
+    def use(self, compute: Device, task):
+        '''called when task is composed on compute, before it fetches its missing layers'''
+        for layer in task.app.env_layers:
+            key = (compute.id, layer.id)
+            if key not in self.pending:
+                continue
+            saved = self.pending.pop(key)
+            if layer.id in task.missing_layers:
+                # the pushed layer was released in this slot and is fetched again
+                continue
+            self.hits += 1
+            self.estimated_saved_time += saved
+
+    def summary(self):
+        '''
+        Returns (dict):
+            prefetch/pushed: pushed layers
+            prefetch/pushed_size: pushed data (MB)
+            prefetch/hit_rate: share of the pushed layers used by a task
+            prefetch/estimated_saved_fetch_time: fetch time of the hit layer estimated when it was pushed, per hit (ms),
+                not a measured start delay reduction
+        '''
+        return {
+            'prefetch/pushed': self.pushed,
+            'prefetch/pushed_size': self.pushed_size,
+            'prefetch/hit_rate': self.hits / self.pushed if self.pushed else 0.,
+            'prefetch/estimated_saved_fetch_time': self.estimated_saved_time / self.hits if self.hits else 0.,
+        }
@@ -0,0 +1,53 @@
+import numpy as np
+
+# independent random streams of the simulation components
+STREAMS = [
+    'topology',     # areas, links and the area of every device
+    'cloud',        # backbone of the remote cloud area, only drawn by the cloud-centric models
+    'devices',      # device kinds, capacities, worker flags and their load fluctuation
+    'tasks',        # task requirements and qos
+    'jitter',       # per-transmission link jitter
+    'placement',    # initial placement of layers & applications on the workers
+    'apps',         # layer & application catalog
+    'replay',       # sampling of the replay buffers
+]
+
+
+class RandomStreams(object):
+    def __init__(self, seed=None):
+        """
+        The random streams of one environment, handed to its topology, devices, tasks and factories, so that
+        several environments of a process (vector envs, replay vs. live runs) never draw from each other's streams.
+
+        Unseeded, every component draws from the global np.random state. Seeded, one generator per component is
+        derived from the seed, so that a component drawing more (or vectorized) numbers never shifts the numbers
+        of the others.
+
+        The generators are np.random.RandomState over independent PCG64 bit generators spawned by a SeedSequence.
+        They are not np.random.Generator, whose methods (integers, standard_normal, random) differ from the
+        randint/randn/rand interface of the global state: the call sites draw from either one with the same code.
+
+        Args:
+            seed (int): None for the global np.random state
+        """
+        self.streams = {}
+        if seed is not None:
+            self.seed(seed)
+
+    def seed(self, seed):
+        children = np.random.SeedSequence(seed).spawn(len(STREAMS))
+        self.streams = {name: np.random.RandomState(np.random.PCG64(child)) for name, child in zip(STREAMS, children)}
+
+    def clear(self):
+        """back to the global np.random state for every component"""
+        self.streams = {}
+
+    def get(self, name):
+        """
+        Returns: the generator of a component, or the np.random module (global state) if the streams are not seeded
+        """
+        return self.streams.get(name, np.random)
+
+
+# the streams of the objects built outside an environment, never seeded
+UNSEEDED = RandomStreams()
@@ -1,5 +1,6 @@
 import numpy as np
 from .app import *
+from .rng import *
 
 task_num = 0
 
@@ -26,6 +27,9 @@ class Task(object):
         # self.app_id = -1 # np.random.randint(0, ApplicationList.app_num)
         self.app: Application = None  # inital in the Environment.next()
         self.providers = [-1, -1, []]
+        self.layer_sources = []     # per missing layer, the depositories its chunks are downloaded from (the first one is its provider)
+        self.extra_filestores = []  # filestores keeping replicas or erasure-coded fragments of the user data of a storage task
+        self.fragment_size = None   # user data kept by each filestore if it is erasure coded, None for whole copies
         self.life_time = self.span  # the rest time slot it can survive on the cloud
     
     def step(self):
@@ -53,7 +57,7 @@ class Task(object):
     def bandwidth(self, type):
         return 0
     
-    def set_QoS_weight(self, start_delay=1, service_latency=1, speed=-1, jilter=1, lifetime=-1, storage=-1, computation=-1):
+    def set_QoS_weight(self, start_delay=1, service_latency=1, speed=-1, jilter=1, lifetime=-1, storage=-1, computation=-1, rng=np.random):
         '''
         QoS[0]: start-up delay (negative, per ms)
                 influenced by the C-D link bandwidth (transition time)
@@ -67,21 +71,22 @@ class Task(object):
         QoS[4]: serving time (positive, per slot)
         QoS[5]: data size (positive, per MB)
         QoS[6]: computation occupation (positive, per GF)
+        rng: the 'tasks' stream drawing the unset weights
         '''
         if start_delay == 1:
-            start_delay = -np.random.randint(1, 10)
+            start_delay = -rng.randint(1, 10)
         if service_latency == 1:
-            service_latency = -np.random.randint(1, 10)
+            service_latency = -rng.randint(1, 10)
         if speed == -1:
-            speed = np.random.randint(1, 5)
+            speed = rng.randint(1, 5)
         if jilter == 1:
-            jilter = -np.random.randint(1, 10)
+            jilter = -rng.randint(1, 10)
         if lifetime == -1:
-            lifetime = np.random.randint(10, 100)
+            lifetime = rng.randint(10, 100)
         if storage == -1:
-            storage = np.random.randint(1, 5)
+            storage = rng.randint(1, 5)
         if computation == -1:
-            computation = np.random.randint(10, 50)
+            computation = rng.randint(10, 50)
         
         self.qos = [start_delay, service_latency, speed, jilter, lifetime, storage, computation]
     
@@ -94,6 +99,10 @@ class Task(object):
         else:
             raise ValueError(f"Input microservice_type {microservice_type} is out of range!")
     
+    def stored_size(self):
+        '''user data kept by a filestore of this storage task (MB)'''
+        return self.mem if self.fragment_size is None else self.fragment_size
+    
     def get_provider(self, microservice_type):
         '''
         microservice_type=2 will return a list of depositories
@@ -108,54 +117,127 @@ class Task(object):
             index = self.missing_layers.index(image_id)
         return self.providers[2][index]
 
+class TaskSet(object):
+    def __init__(self):
+        '''An insertion-ordered multiset of tasks with O(1) append and removal
+        a task may be appended several times, e.g. a depository serving several missing layers of it
+        '''
+        self.counts = {}    # key: task, value: multiplicity
+        self.size = 0
+    
+    def append(self, task):
+        self.counts[task] = self.counts.get(task, 0) + 1
+        self.size += 1
+    
+    def remove(self, task):
+        n = self.counts[task]   # KeyError if missing, like list.remove's ValueError
+        if n == 1:
+            del self.counts[task]
+        else:
+            self.counts[task] = n - 1
+        self.size -= 1
+    
+    def clear(self):
+        self.counts.clear()
+        self.size = 0
+    
+    def __len__(self):
+        return self.size
+    
+    def __contains__(self, task):
+        return task in self.counts
+    
+    def __iter__(self):
+        for task, n in list(self.counts.items()):
+            for _ in range(n):
+                yield task
+
+
+class ScheduledTaskStore(object):
+    def __init__(self):
+        '''Scheduled tasks bucketed by the slot in which they run out of lifetime
+        releasing a slot only visits the tasks expiring in it
+        '''
+        self.buckets = {}   # key: expiry slot, value: list of tasks in scheduling order
+        self.size = 0
+    
+    def add(self, task, expiry_slot):
+        self.buckets.setdefault(expiry_slot, []).append(task)
+        self.size += 1
+    
+    def pop_expired(self, slot):
+        '''remove and return the tasks expiring in the input slot, in their scheduling order'''
+        tasks = self.buckets.pop(slot, [])
+        if len(self.buckets) and min(self.buckets) < slot:
+            # a bucket of a past slot was skipped, its tasks would never be released
+            task = self.buckets[min(self.buckets)][0]
+            raise TimeoutError(f"The task {task.id} is out of date, but nobody deals with it!")
+        for task in tasks:
+            task.life_time = 0
+        self.size -= len(tasks)
+        return tasks
+    
+    def clear(self):
+        self.buckets.clear()
+        self.size = 0
+    
+    def __len__(self):
+        return self.size
+    
+    def __iter__(self):
+        for slot in sorted(self.buckets):
+            for task in self.buckets[slot]:
+                yield task
+
+
 class ProcessTask(Task):
-    def __init__(self,  user_id=-1):
-        cpu = max(5 + 5 * np.random.randn(1)[0], .1)       # 5
+    def __init__(self,  user_id=-1, rng=np.random):
+        cpu = max(5 + 5 * rng.randn(1)[0], .1)       # 5
         mem = 5 # max(5 + 1 * np.random.randn(1)[0], 0.) 
         super().__init__(0, cpu, mem, user_id)
-        self.set_QoS_weight()
+        self.set_QoS_weight(rng=rng)
 
 
 class StorageTask(Task):
-    def __init__(self, user_id=-1):
+    def __init__(self, user_id=-1, rng=np.random):
         '''
         this task should give its storing time span
         different from others, its memory size will affect the filestore worker instead of the compute worker
         '''
         self.files_mem = []
         self.files_id = []
-        span = round(max(5 + 2 * np.random.randn(1)[0], 1.))        # 5 time slots existing on the cloud drive
+        span = round(max(5 + 2 * rng.randn(1)[0], 1.))        # 5 time slots existing on the cloud drive
         # span = 1
-        file_num = int(max(20 + 5 * np.random.randn(1)[0], 1.))          # 20 files
+        file_num = int(max(20 + 5 * rng.randn(1)[0], 1.))          # 20 files
         mem = 0.
         for i in range(file_num):
             # file_mem = max(500 + 2000 * np.random.randn(1)[0], 10.)       # MB per file
             file_mem = 500
-            file_id = np.random.randint(0, 99)
+            file_id = rng.randint(0, 99)
             while file_id in self.files_id: # 不重复
                 file_id += 1
             self.files_id.append(file_id)
             self.files_mem.append(file_mem)
             mem += file_mem
         super().__init__(1, 0., mem, user_id, span)
-        self.set_QoS_weight()
+        self.set_QoS_weight(rng=rng)
 
 
 class DesktopTask(Task):
-    def __init__(self, user_id=-1, bandwidth_maximum=1e6):
+    def __init__(self, user_id=-1, bandwidth_maximum=1e6, rng=np.random):
         '''
         this task should give its lasting time span
         '''
-        cpu = max(5 + 10 * np.random.randn(1)[0], 0.1)       # 5
-        span = round(max(1 + 3 * np.random.randn(1)[0], 1.))        # time slots existing on the cloud drive
-        mem = max(1000 + 300 * np.random.randn(1)[0], 10.)
+        cpu = max(5 + 10 * rng.randn(1)[0], 0.1)       # 5
+        span = round(max(1 + 3 * rng.randn(1)[0], 1.))        # time slots existing on the cloud drive
+        mem = max(1000 + 300 * rng.randn(1)[0], 10.)
         # span = 1
         super().__init__(2, cpu, mem, user_id, span)
-        self.set_QoS_weight()
+        self.set_QoS_weight(rng=rng)
         
         # self.bw = max(100 + 30 * np.random.randn(1)[0], 0.)/8       # (10 ~ 190)/8
         # self.bw = min(self.bw, bandwidth_maximum)
-        self.bw = np.random.randint(1, max(2, min(100, int(bandwidth_maximum*8))*100)) / 100. / 8.
+        self.bw = rng.randint(1, max(2, min(100, int(bandwidth_maximum*8))*100)) / 100. / 8.
     
     def bandwidth(self, type):
         '''get bandwidth occupation
@@ -177,4 +259,24 @@ class DesktopTask(Task):
             return 0.
 
 
+def build_task(type, user_id, cpu, mem, span, qos, bw=0., files_id=[], files_mem=[]):
+    '''build a task from properties drawn in advance (e.g. by a TaskFactory), without touching the random state
+    type: 0-process, 1-storage, 2-desktop
+    '''
+    if type == 0:
+        task = ProcessTask.__new__(ProcessTask)
+    elif type == 1:
+        task = StorageTask.__new__(StorageTask)
+        task.files_id = list(files_id)
+        task.files_mem = list(files_mem)
+    elif type == 2:
+        task = DesktopTask.__new__(DesktopTask)
+        task.bw = bw
+    else:
+        raise ValueError(f"Input task type {type} is out of range!")
+    Task.__init__(task, type, cpu, mem, user_id, span)
+    task.qos = list(qos)
+    return task
+
+
 # about 51% volunteers are capable of being providers
\ No newline at end of file
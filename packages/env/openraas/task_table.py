@@ -0,0 +1,156 @@
+import numpy as np
+from .task import *
+from .app import *
+from .rng import *
+
+FILE_KINDS = 100    # there are totally 100 kinds of files for storage tasks
+FILE_SIZE = 500     # MB per file
+
+class TaskTable(object):
+    def __init__(self, user_id, type, cpu, mem, span, qos, app_id, bw, files_id, files_ptr, appList: ApplicationList=None):
+        '''Columnar storage of the tasks generated in a slot
+        every column has one row per task, except files_id which is a ragged array indexed by files_ptr
+        the files of task i are files_id[files_ptr[i]:files_ptr[i+1]]
+        Task objects are only materialized when they are indexed
+        '''
+        self.user_id = np.asarray(user_id, dtype=np.int64)
+        self.type = np.asarray(type, dtype=np.int64)
+        self.cpu = np.asarray(cpu, dtype=np.float64)
+        self.mem = np.asarray(mem, dtype=np.float64)
+        self.span = np.asarray(span, dtype=np.int64)
+        self.qos = np.asarray(qos, dtype=np.int64).reshape(-1, 7)
+        self.app_id = np.asarray(app_id, dtype=np.int64)  # -1 means it should be chosen by the environment
+        self.bw = np.asarray(bw, dtype=np.float64)
+        self.files_id = np.asarray(files_id, dtype=np.int64)
+        self.files_ptr = np.asarray(files_ptr, dtype=np.int64)
+        self.appList = appList
+
+        self.tasks: list[Task] = [None for _ in range(len(self.user_id))]
+
+    def __len__(self):
+        return len(self.user_id)
+
+    def __getitem__(self, index):
+        if self.tasks[index] is None:
+            self.tasks[index] = self.materialize(index)
+        return self.tasks[index]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def clear(self):
+        self.tasks = [None for _ in range(len(self))]
+
+    def files_of(self, index):
+        return self.files_id[self.files_ptr[index]:self.files_ptr[index+1]]
+
+    def materialize(self, index):
+        '''build the Task object of the row index'''
+        files_id = self.files_of(index).tolist()
+        task = build_task(int(self.type[index]), int(self.user_id[index]), float(self.cpu[index]), float(self.mem[index]),
+                          int(self.span[index]), self.qos[index].tolist(), float(self.bw[index]),
+                          files_id, [FILE_SIZE for _ in files_id])
+        if self.app_id[index] != -1 and self.appList is not None:
+            task.app = self.appList.get_data_by_id(int(self.app_id[index]))
+        return task
+
+    @staticmethod
+    def from_tasks(tasks, appList: ApplicationList=None):
+        '''gather already constructed tasks into a table (the tasks themselves are kept)'''
+        files_id = []
+        files_ptr = [0]
+        for task in tasks:
+            if task.type == 1:
+                files_id += task.files_id
+            files_ptr.append(len(files_id))
+        table = TaskTable([task.user_id for task in tasks],
+                          [task.type for task in tasks],
+                          [task.cpu for task in tasks],
+                          [task.mem for task in tasks],
+                          [task.span for task in tasks],
+                          [task.qos for task in tasks],
+                          [task.app.id if task.app is not None else -1 for task in tasks],
+                          [task.bw if task.type == 2 else 0. for task in tasks],
+                          files_id, files_ptr, appList)
+        table.tasks = list(tasks)
+        return table
+
+
+class TaskFactory(object):
+    def __init__(self, appList: ApplicationList, streams: RandomStreams=None):
+        '''Generate the tasks of all clients in a slot with vectorized draws from the 'tasks' stream'''
+        self.appList = appList
+        self.streams = streams or UNSEEDED
+        self.app_ids = [np.array([app.id for app in appList.get_list(t)], dtype=np.int64) for t in range(appList.type_num)]
+
+    def generate(self, clients, types=None):
+        '''
+        clients: the client devices requiring services in this slot (100% chance for each one)
+        types: task type of every client (default the task_type of the clients)
+        returns a TaskTable with one task per client
+        '''
+        rng = self.streams.get('tasks')
+        n = len(clients)
+        user_id = np.array([client.id for client in clients], dtype=np.int64)
+        client_bw = np.array([client.bw for client in clients], dtype=np.float64)
+
+        # 1. task types, -1 for random (1:6:3)
+        if types is None:
+            types = np.array([client.task_type for client in clients], dtype=np.int64)
+        else:
+            types = np.array(types, dtype=np.int64)
+        rand_mask = types == -1
+        if rand_mask.any():
+            r = rng.randint(0, 100, size=rand_mask.sum())
+            types[rand_mask] = np.where(r < 10, 0, np.where(r < 70, 1, 2))
+
+        cpu = np.zeros(n)
+        mem = np.zeros(n)
+        span = np.ones(n, dtype=np.int64)
+        bw = np.zeros(n)
+
+        # 2. processing tasks
+        p = np.flatnonzero(types == 0)
+        cpu[p] = np.maximum(5 + 5 * rng.randn(len(p)), .1)
+        mem[p] = 5
+
+        # 3. storage tasks, files are drawn without replacement
+        s = np.flatnonzero(types == 1)
+        span[s] = np.round(np.maximum(5 + 2 * rng.randn(len(s)), 1.))
+        file_num = np.minimum(np.maximum(20 + 5 * rng.randn(len(s)), 1.).astype(np.int64), FILE_KINDS)
+        mem[s] = file_num * FILE_SIZE
+        files_count = np.zeros(n, dtype=np.int64)
+        files_count[s] = file_num
+        files_ptr = np.concatenate([[0], np.cumsum(files_count)])
+        if len(s):
+            order = np.argsort(rng.rand(len(s), FILE_KINDS), axis=1)
+            keep = np.arange(FILE_KINDS)[None, :] < file_num[:, None]
+            files_id = order[keep]  # row-major, so files of each task stay together
+        else:
+            files_id = np.zeros(0, dtype=np.int64)
+
+        # 4. desktop tasks
+        d = np.flatnonzero(types == 2)
+        cpu[d] = np.maximum(5 + 10 * rng.randn(len(d)), 0.1)
+        span[d] = np.round(np.maximum(1 + 3 * rng.randn(len(d)), 1.))
+        mem[d] = np.maximum(1000 + 300 * rng.randn(len(d)), 10.)
+        high = np.maximum(2, np.minimum(100, (client_bw[d] * 8).astype(np.int64)) * 100)
+        bw[d] = rng.randint(1, high) / 100. / 8. if len(d) else 0.
+
+        # 5. QoS weights, see Task.set_QoS_weight
+        qos = np.stack([-rng.randint(1, 10, size=n),
+                        -rng.randint(1, 10, size=n),
+                        rng.randint(1, 5, size=n),
+                        -rng.randint(1, 10, size=n),
+                        rng.randint(10, 100, size=n),
+                        rng.randint(1, 5, size=n),
+                        rng.randint(10, 50, size=n)], axis=1)
+
+        # 6. applications
+        app_id = np.full(n, -1, dtype=np.int64)
+        for t in range(self.appList.type_num):
+            index = np.flatnonzero(types == t)
+            app_id[index] = self.app_ids[t][rng.randint(0, len(self.app_ids[t]), size=len(index))]
+
+        return TaskTable(user_id, types, cpu, mem, span, qos, app_id, bw, files_id, files_ptr, self.appList)
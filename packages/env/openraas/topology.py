@@ -1,17 +1,20 @@
 import numpy as np
+import bisect
 from .device import *
+from .rng import *
 
 p0 = 1e-10
 n0 = -p0
 
 
 class Line(object):
-    def __init__(self, bandwidth, latency, jilter):
+    def __init__(self, bandwidth, latency, jilter, streams: RandomStreams=None):
         self.capacity = [bandwidth, latency, jilter]
+        self.streams = streams or UNSEEDED
         self.reset()
 
     def get_jilter(self):
-        ans = round(max(self.jilter + self.jilter/3 * np.random.randn(1)[0], 0.))  # 0 ~ 2 mean_jilter
+        ans = round(max(self.jilter + self.jilter/3 * self.streams.get('jitter').randn(1)[0], 0.))  # 0 ~ 2 mean_jilter
         return ans
 
     def reset(self):
@@ -25,20 +28,24 @@ class Line(object):
 
 
 class Area(object):
-    def __init__(self, id):
+    def __init__(self, id, streams: RandomStreams=None):
         self.id = id
+        self.streams = streams or UNSEEDED
         self.devices: list[int] = []    # devices' IDs
         self.lines: list[Line] = []     # devices' lines with respect to self.devices
+        self.line_of = {}               # key: device id, value: its line
         
-        bw = round(max(1000 + 300 * np.random.randn(1)[0], 100.))/8 # 1000/8 MBps
-        l = max(10 + 5 * np.random.randn(1)[0], 1.) # 1 ~ 19 ms
-        j = max(5 + 5 * np.random.randn(1)[0], 0) # 2 ~ 8
+        rng = self.streams.get('topology')
+        bw = round(max(1000 + 300 * rng.randn(1)[0], 100.))/8 # 1000/8 MBps
+        l = max(10 + 5 * rng.randn(1)[0], 1.) # 1 ~ 19 ms
+        j = max(5 + 5 * rng.randn(1)[0], 0) # 2 ~ 8
         
-        self.backbone = Line(bw, l, j)
+        self.backbone = Line(bw, l, j, self.streams)
     
     def clear(self):
         self.devices.clear()
         self.lines.clear()
+        self.line_of.clear()
         self.backbone.reset()
     
     def reset(self):
@@ -56,24 +63,78 @@ class Area(object):
         The property type indicates the wire or wireless device: 0-wire, 1-wireless.
         Bandwidth is the network interface bandwith of the device.
         """
+        rng = self.streams.get('topology')
         if type == 0:
-            l = max(3 + 1 * np.random.randn(1)[0], 1.) # wire 1 ~ 6 ms
-            j = max(4 + 1 * np.random.randn(1)[0], 0) # 1 ~ 7
+            l = max(3 + 1 * rng.randn(1)[0], 1.) # wire 1 ~ 6 ms
+            j = max(4 + 1 * rng.randn(1)[0], 0) # 1 ~ 7
         elif type == 1:
-            l = max(7 + 2 * np.random.randn(1)[0], 1.) # wireless 1 ~ 13 ms
-            j = max(6 + 2 * np.random.randn(1)[0], 0) # 0 ~ 12
+            l = max(7 + 2 * rng.randn(1)[0], 1.) # wireless 1 ~ 13 ms
+            j = max(6 + 2 * rng.randn(1)[0], 0) # 0 ~ 12
         else:
             raise ValueError(f"The input line type {type} is out of range!")
         
         self.devices.append(device_id)
-        self.lines.append(Line(bandwidth, l, j))
+        self.lines.append(Line(bandwidth, l, j, self.streams))
+        self.line_of[device_id] = self.lines[-1]
     
 
+class BandwidthIndex(object):
+    def __init__(self, areas, device_ids):
+        '''Indexed devices of every area ordered by the remaining bandwidth of their interface, so that
+        "devices with at least X MBps free" is a range query instead of a scan of link states
+
+        Args:
+            areas (list): areas of the topology
+            device_ids (set): devices to index, e.g. the workers
+        '''
+        self.areas = areas
+        self.device_ids = set(device_ids)
+        self.keys = [[] for _ in areas]     # per area, sorted (bandwidth, device id)
+        self.bw_of = {}                     # key: device id, value: indexed bandwidth
+        self.rebuild()
+
+    def rebuild(self):
+        self.bw_of.clear()
+        for area, keys in zip(self.areas, self.keys):
+            keys.clear()
+            for device_id, line in zip(area.devices, area.lines):
+                if device_id in self.device_ids:
+                    keys.append((line.bandwidth, device_id))
+                    self.bw_of[device_id] = line.bandwidth
+            keys.sort()
+
+    def update(self, area_id, device_id, bandwidth):
+        if device_id not in self.bw_of:
+            return
+        keys = self.keys[area_id]
+        old = (self.bw_of[device_id], device_id)
+        del keys[bisect.bisect_left(keys, old)]
+        bisect.insort(keys, (bandwidth, device_id))
+        self.bw_of[device_id] = bandwidth
+
+    def at_least(self, area_id, bandwidth):
+        '''ids of the devices of an area whose interface has at least the bandwidth left'''
+        keys = self.keys[area_id]
+        return [device_id for _, device_id in keys[bisect.bisect_left(keys, (bandwidth, -1)):]]
+
+    def reachable_with(self, area_id, bandwidth):
+        '''ids of the indexed devices whose link towards area_id has at least the bandwidth left,
+        the backbones of both areas included when they differ'''
+        ids = self.at_least(area_id, bandwidth)
+        if self.areas[area_id].backbone.bandwidth >= bandwidth:
+            for a, area in enumerate(self.areas):
+                if a != area_id and area.backbone.bandwidth >= bandwidth:
+                    ids += self.at_least(a, bandwidth)
+        return ids
+
+
 class Topology(object):
-    def __init__(self, area_num):
+    def __init__(self, area_num, streams: RandomStreams=None):
         self.area_num = area_num
-        self.areas: list[Area] = [Area(i) for i in range(area_num)]
+        self.streams = streams or UNSEEDED     # random streams of the environment
+        self.areas: list[Area] = [Area(i, self.streams) for i in range(area_num)]
         self.device_to_area = {}    # key: device id, value: area id
+        self.bandwidth_index: BandwidthIndex = None     # only maintained once enable_bandwidth_index() is called
         self.reset()
         
         self.debug_mode = False
@@ -82,10 +143,17 @@ class Topology(object):
         for area in self.areas:
             area.clear()
         self.device_to_area.clear()
+        if self.bandwidth_index is not None:
+            self.bandwidth_index.rebuild()
     
     def reset(self):
         for area in self.areas:
             area.reset()
+        if self.bandwidth_index is not None:
+            self.bandwidth_index.rebuild()
+    
+    def enable_bandwidth_index(self, device_ids):
+        self.bandwidth_index = BandwidthIndex(self.areas, device_ids)
     
     def step(self):
         for area in self.areas:
@@ -93,10 +161,11 @@ class Topology(object):
     
     def set_cloud(self):
         # 设置 0 号区域为 cloud
-        bw = round(max(10000 + 2000 * np.random.randn(1)[0], 100.))/8 
-        l = max(10 + 10 * np.random.randn(1)[0], 1.)
-        j = max(5 + 10 * np.random.randn(1)[0], 0)
-        self.areas[0].backbone = Line(bw, l, j)
+        rng = self.streams.get('cloud')
+        bw = round(max(10000 + 2000 * rng.randn(1)[0], 100.))/8 
+        l = max(10 + 10 * rng.randn(1)[0], 1.)
+        j = max(5 + 10 * rng.randn(1)[0], 0)
+        self.areas[0].backbone = Line(bw, l, j, self.streams)
     
     def get_area_by_device_id(self, device_id: int):
         return self.areas[self.device_to_area[device_id]]
@@ -105,15 +174,14 @@ class Topology(object):
         return self.get_area_by_device_id(device.id)
     
     def get_device_interface_link_by_id(self, device_id: int):
-        area = self.get_area_by_device_id(device_id)
-        return area.lines[area.devices.index(device_id)]
+        return self.areas[self.device_to_area[device_id]].line_of[device_id]
     
     def get_device_interface_link(self, device: Device):
         return self.get_device_interface_link_by_id(device.id)
     
     def add_device(self, device: Device, area_id=-1):
         if area_id == -1:
-            area_id = np.random.randint(0, self.area_num)
+            area_id = self.streams.get('topology').randint(0, self.area_num)
         type = 0 if device.print_type() == 'server' else 1
         self.areas[area_id].add_device(type, device.id, device.bw)
         self.device_to_area[device.id] = area_id
@@ -153,6 +221,17 @@ class Topology(object):
     def get_link_states_between_devices(self, device1: Device, device2: Device):
         return self.get_link_states_between_devices_by_id(device1.id, device2.id)
     
+    def get_link_bandwidth_between_devices(self, device1: Device, device2: Device):
+        """minimum bandwidth on the link, as get_link_states_between_devices but without sampling jilters"""
+        if device1.id == device2.id:
+            return 1e8
+        a1 = self.device_to_area[device1.id]
+        a2 = self.device_to_area[device2.id]
+        speed = min(self.areas[a1].line_of[device1.id].bandwidth, self.areas[a2].line_of[device2.id].bandwidth)
+        if a1 != a2:
+            speed = min(speed, self.areas[a1].backbone.bandwidth, self.areas[a2].backbone.bandwidth)
+        return speed
+    
     # def cal_transmit_delay_between_devices_by_id(self, d1: int, d2: int, datasize):
     #     """Calculate the transmition delay of the file bewteen two devices
 
@@ -189,6 +268,9 @@ class Topology(object):
         i2.bandwidth -= bw
         device1.bw = i1.bandwidth
         device2.bw = i2.bandwidth
+        if self.bandwidth_index is not None:
+            self.bandwidth_index.update(a1.id, device1.id, i1.bandwidth)
+            self.bandwidth_index.update(a2.id, device2.id, i2.bandwidth)
         
         if a1 != a2:
             a1.backbone.bandwidth -= bw
@@ -257,6 +339,40 @@ class Topology(object):
         duration = datasize / (speed+1e6) * 1000 # ms
         return duration
     
+    def plan_parallel_transmission(self, device: Device, sources, datasize):
+        """split a file over several sources downloading it in parallel to device, so that all chunks arrive together
+        every source starts after its link latency & occupied time and sends at its link speed (water-filling)
+
+        Args:
+            device (Device): the receiver
+            sources (list[Device]): devices holding the file
+            datasize (float): file size (MB)
+        
+        Returns:
+            end_time (float): arrival time of the whole file after the begin of this slot (ms)
+            chunks (list[float]): size sent by every source (MB), 0. for the ones starting too late to help
+        """
+        starts = []
+        rates = []
+        for source in sources:
+            speed, latency, _ = self.get_link_states_between_devices(device, source)
+            starts.append(latency + self.get_link_occupied_time(device, source))
+            rates.append((speed+1e6) / 1000)  # MB per ms, as cal_transmission_duration
+        
+        # add sources by start time until the next one would start after the common end time
+        order = sorted(range(len(sources)), key=lambda i: starts[i])
+        sent = datasize
+        rate = 0.
+        for k, i in enumerate(order):
+            sent += starts[i] * rates[i]
+            rate += rates[i]
+            end_time = sent / rate
+            if k+1 == len(order) or end_time <= starts[order[k+1]]:
+                break
+        
+        chunks = [max(end_time - start, 0.) * r for start, r in zip(starts, rates)]
+        return end_time, chunks
+    
     def check_areas(self):
         device_num = 0
         for area in self.areas:
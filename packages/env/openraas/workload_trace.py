@@ -0,0 +1,296 @@
+import numpy as np
+import struct
+import os
+from .task_table import *
+
+'''binary workload trace
+header: MAGIC, version, M, N (uint32), the servers & devices numbers of the recording environment
+then a sequence of chunks, each one starting with CHUNK (kind, tasks number, files number):
+    EPISODE: marks the beginning of an episode, no payload
+    SLOT: the tasks of a slot, one array per column of TRACE_COLUMNS (tasks number rows each),
+          then the file ids of the storage tasks (files number rows)
+'''
+
+MAGIC = b'ORWT'
+VERSION = 2
+HEADER = struct.Struct('<4sIII')
+CHUNK = struct.Struct('<BII')
+EPISODE = 1
+SLOT = 2
+
+# (column, dtype, width), floats are kept in float64 so that a replay is bit-for-bit identical
+TRACE_COLUMNS = [
+    ('user_id', '<i4', 1),
+    ('type', '<i1', 1),
+    ('cpu', '<f8', 1),
+    ('mem', '<f8', 1),
+    ('span', '<i4', 1),
+    ('qos', '<i4', 7),
+    ('app_id', '<i4', 1),
+    ('bw', '<f8', 1),
+    ('files_count', '<i2', 1),
+]
+FILES_DTYPE = '<i2'
+
+
+class WorkloadTraceWriter(object):
+    def __init__(self, path, M, N):
+        '''Record the tasks of every slot into a binary trace, see the format above
+        M, N: servers & devices numbers of the environment, a replay requires the same ones
+        '''
+        dir = os.path.dirname(path)
+        if dir and not os.path.exists(dir):
+            os.makedirs(dir)
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, M, N))
+
+    def write_episode(self):
+        self.file.write(CHUNK.pack(EPISODE, 0, 0))
+
+    def write_slot(self, tasks: TaskTable):
+        '''tasks: TaskTable of the slot, with the app of every task decided'''
+        n = len(tasks)
+        columns = {
+            'user_id': tasks.user_id,
+            'type': tasks.type,
+            'cpu': tasks.cpu,
+            'mem': tasks.mem,
+            'span': tasks.span,
+            'qos': tasks.qos,
+            'app_id': tasks.app_id,
+            'bw': tasks.bw,
+            'files_count': np.diff(tasks.files_ptr),
+        }
+        self.file.write(CHUNK.pack(SLOT, n, len(tasks.files_id)))
+        for name, dtype, width in TRACE_COLUMNS:
+            self.file.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.file.write(np.ascontiguousarray(tasks.files_id, dtype=FILES_DTYPE).tobytes())
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class WorkloadTraceReader(object):
+    def __init__(self, path, appList: ApplicationList=None, M=None, N=None):
+        '''Stream the slots of a binary trace, only one slot is held in memory
+        start_episode() moves to the next recorded episode (back to the first one after the last),
+        next_slot() returns the tasks of the next slot of the episode (the episode is replayed again if it runs out)
+        M, N: servers & devices numbers of the replaying environment, which must be the recorded ones
+            since the tasks refer to their clients by device id (None to skip the check)
+        '''
+        self.path = path
+        self.appList = appList
+        self.file = open(path, 'rb')
+        buf = self.file.read(HEADER.size)
+        if len(buf) < HEADER.size or buf[:4] != MAGIC or HEADER.unpack(buf)[1] != VERSION:
+            self.file.close()
+            raise ValueError(f"{path} is not a workload trace of version {VERSION}.")
+        _, _, self.M, self.N = HEADER.unpack(buf)
+        if (M is not None and M != self.M) or (N is not None and N != self.N):
+            self.file.close()
+            raise ValueError(f"The workload trace {path} was recorded with M={self.M} N={self.N}, "
+                             f"it cannot be replayed with M={M} N={N}.")
+        self.episode_offset = None  # file offset of the first slot of the current episode
+
+    def _read_chunk_header(self):
+        buf = self.file.read(CHUNK.size)
+        if len(buf) < CHUNK.size:
+            return None
+        return CHUNK.unpack(buf)
+
+    def _skip_payload(self, n, files_num):
+        size = sum(np.dtype(dtype).itemsize * width for _, dtype, width in TRACE_COLUMNS) * n
+        self.file.seek(size + np.dtype(FILES_DTYPE).itemsize * files_num, os.SEEK_CUR)
+
+    def start_episode(self):
+        rewound = False
+        while True:
+            header = self._read_chunk_header()
+            if header is None:
+                if rewound:
+                    raise ValueError(f"The workload trace {self.path} does not contain any episode.")
+                self.file.seek(HEADER.size)
+                rewound = True
+                continue
+            kind, n, files_num = header
+            if kind == EPISODE:
+                self.episode_offset = self.file.tell()
+                return
+            self._skip_payload(n, files_num)
+
+    def next_slot(self, clients=None):
+        if self.episode_offset is None:
+            self.start_episode()
+        header = self._read_chunk_header()
+        if header is None or header[0] == EPISODE:
+            # the recorded episode is shorter than the simulated one
+            self.file.seek(self.episode_offset)
+            header = self._read_chunk_header()
+            if header is None or header[0] != SLOT:
+                raise ValueError(f"The episode at offset {self.episode_offset} of {self.path} has no slot.")
+        _, n, files_num = header
+
+        columns = {}
+        for name, dtype, width in TRACE_COLUMNS:
+            size = np.dtype(dtype).itemsize * width * n
+            columns[name] = np.frombuffer(self.file.read(size), dtype=dtype)
+        files_id = np.frombuffer(self.file.read(np.dtype(FILES_DTYPE).itemsize * files_num), dtype=FILES_DTYPE)
+        files_ptr = np.concatenate([[0], np.cumsum(columns['files_count'], dtype=np.int64)])
+        return TaskTable(columns['user_id'], columns['type'], columns['cpu'], columns['mem'], columns['span'],
+                         columns['qos'], columns['app_id'], columns['bw'], files_id, files_ptr, self.appList)
+
+    def close(self):
+        self.file.close()
+
+
+'''external columnar trace
+a directory with one .npy file per column, all with one row per task, rows sorted by arrival time
+columns are memory-mapped, so only the pages of the slot being read are loaded whatever the trace length
+optional ragged storage files: files_ptr (rows + 1 offsets) & files_id
+'''
+
+# task attribute: trace column, overridden by the field_map of ColumnarTraceSource
+DEFAULT_FIELD_MAP = {
+    'time': 'time',             # arrival time, sorted (required)
+    'user_id': 'user_id',       # any integer id, folded onto the simulated clients (required)
+    'type': 'type',             # 0 1 2 - process storage desktop
+    'cpu': 'cpu',
+    'mem': 'mem',
+    'span': 'span',             # slots
+    'bw': 'bw',                 # streaming bandwidth of desktop tasks
+    'app_id': 'app_id',
+    'qos': 'qos',               # (rows, 7) QoS weights, see Task.set_QoS_weight
+    'files_ptr': 'files_ptr',
+    'files_id': 'files_id',
+}
+
+
+def save_columnar_trace(path, **columns):
+    '''write the columns (arrays with one row per task) as a columnar trace directory'''
+    if not os.path.exists(path):
+        os.makedirs(path)
+    for name, column in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.asarray(column))
+
+
+class ColumnarTraceSource(object):
+    def __init__(self, path, factory: TaskFactory, first_client, clients_num, slot_length=1., field_map=None,
+                 scale=None, type_codes=None, transforms=None):
+        '''Feed Environment.next with the per-slot task batches of an external columnar trace
+        the trace is read as one continuous stream: consecutive episodes replay consecutive windows of it,
+        and it starts over once exhausted
+
+        Mapping from the trace fields to the task attributes:
+            field_map (dict): {task attribute: trace column}, on top of DEFAULT_FIELD_MAP
+            scale (dict): {task attribute: factor} applied to numeric columns, e.g. unit conversions
+            type_codes (dict): {trace type code: task type (0 1 2)}
+            transforms (dict): {task attribute: function of the column slice}, applied after scale
+        user ids are folded onto the simulated clients: first_client + user_id % clients_num
+        attributes missing from the trace are drawn by the factory as in batched_task_generation
+
+        Args:
+            path (str): trace directory
+            factory (TaskFactory): fills the missing attributes
+            first_client (int): id of the first client device (M)
+            clients_num (int): number of client devices (N)
+            slot_length (float): trace time covered by a slot
+        '''
+        self.path = path
+        self.factory = factory
+        self.first_client = first_client
+        self.clients_num = clients_num
+        self.slot_length = slot_length
+        self.field_map = dict(DEFAULT_FIELD_MAP)
+        self.field_map.update(field_map or {})
+        self.scale = scale or {}
+        self.type_codes = type_codes or {}
+        self.transforms = transforms or {}
+
+        self.columns = {}   # trace column: memory-mapped array
+        for name in os.listdir(path):
+            if name.endswith('.npy'):
+                self.columns[name[:-4]] = np.load(os.path.join(path, name), mmap_mode='r')
+        for attr in ['time', 'user_id']:
+            if self.field_map[attr] not in self.columns:
+                raise KeyError(f"The trace {path} has no column {self.field_map[attr]} for the required field {attr}.")
+        self.rows = len(self.columns[self.field_map['time']])
+        if self.rows == 0:
+            raise ValueError(f"The trace {path} is empty.")
+
+        self.clients = None
+        self.slots = self.iter_slots()
+
+    def column(self, attr, begin, end):
+        '''the rows [begin, end) of the column mapped to attr, None if the trace does not have it'''
+        name = self.field_map.get(attr)
+        if name is None or name not in self.columns:
+            return None
+        values = np.array(self.columns[name][begin:end])
+        if attr in self.scale:
+            values = values * self.scale[attr]
+        if attr == 'type' and len(self.type_codes):
+            codes = np.full(len(values), -1, dtype=np.int64)
+            for code, task_type in self.type_codes.items():
+                codes[values == code] = task_type
+            if (codes == -1).any():
+                raise ValueError(f"Unknown task type codes {np.unique(values[codes == -1])} in the trace {self.path}.")
+            values = codes
+        if attr in self.transforms:
+            values = self.transforms[attr](values)
+        return values
+
+    def iter_slots(self):
+        '''yield the rows range [begin, end) of every slot, empty slots included'''
+        time = self.columns[self.field_map['time']]
+        t0 = time[0]
+        begin, slot = 0, 0
+        while begin < self.rows:
+            slot += 1
+            end = int(np.searchsorted(time, t0 + slot * self.slot_length, side='left'))
+            yield begin, end
+            begin = end
+
+    def build(self, begin, end):
+        '''the TaskTable of the rows [begin, end)'''
+        user_id = self.first_client + self.column('user_id', begin, end).astype(np.int64) % self.clients_num
+        types = self.column('type', begin, end)
+        clients = [self.clients[u - self.first_client] for u in user_id]
+        tasks = self.factory.generate(clients, types)
+
+        for attr, dtype in [('cpu', np.float64), ('mem', np.float64), ('span', np.int64), ('bw', np.float64), ('app_id', np.int64)]:
+            values = self.column(attr, begin, end)
+            if values is not None:
+                setattr(tasks, attr, values.astype(dtype))
+        qos = self.column('qos', begin, end)
+        if qos is not None:
+            tasks.qos = qos.astype(np.int64).reshape(-1, 7)
+
+        files_ptr = self.column('files_ptr', begin, end + 1)
+        if files_ptr is not None and self.field_map['files_id'] in self.columns:
+            files_ptr = files_ptr.astype(np.int64)
+            tasks.files_id = self.column('files_id', files_ptr[0], files_ptr[-1]).astype(np.int64)
+            tasks.files_ptr = files_ptr - files_ptr[0]
+            if self.field_map['mem'] not in self.columns:
+                storage = tasks.type == 1
+                tasks.mem[storage] = np.diff(tasks.files_ptr)[storage] * FILE_SIZE
+        return tasks
+
+    def start_episode(self):
+        pass
+
+    def next_slot(self, clients=None):
+        '''
+        clients: the client devices of the environment, whose properties bound the drawn attributes
+        '''
+        if clients is not None:
+            self.clients = clients
+        try:
+            begin, end = next(self.slots)
+        except StopIteration:
+            self.slots = self.iter_slots()
+            begin, end = next(self.slots)
+        return self.build(begin, end)
+
+    def close(self):
+        self.columns.clear()
@@ -0,0 +1,150 @@
+import multiprocessing as mp
+import numpy as np
+from .wrapper import *
+
+def _make_env(config, seed):
+    """the EnvWrapper of a worker, its topology generated from seed by the global state or by its streams"""
+    # the topology is generated in the constructor, so seed before creating the environment
+    np.random.seed(seed)
+    env = EnvWrapper(dict(config, seed=seed))
+    env.seed(seed)
+    return env
+
+def _vec_worker(rank, config, seed, remote, parent_remote, buffers, shapes):
+    """step one EnvWrapper in a subprocess
+    observations, rewards, new_slot flags, action masks and actions are exchanged through shared memory,
+    only short commands go through the pipe
+    """
+    parent_remote.close()
+    states, rewards, new_slots, masks, actions = [np.frombuffer(b, dtype=d).reshape(shape) for b, (d, shape) in zip(buffers, shapes)]
+
+    env = _make_env(config, seed)
+
+    try:
+        while True:
+            cmd = remote.recv()
+            if cmd == 'reset':
+                states[rank] = env.reset()
+                rewards[rank] = 0.
+                new_slots[rank] = False
+                masks[rank] = env.get_action_mask()
+                remote.send(None)
+            elif cmd == 'step':
+                state, reward, new_slot = env.step(int(actions[rank]))
+                states[rank] = state
+                rewards[rank] = reward
+                new_slots[rank] = new_slot
+                masks[rank] = env.get_action_mask()
+                remote.send(None)
+            elif cmd == 'statistics':
+                remote.send(env.log_episode_statistics())
+            elif cmd == 'close':
+                remote.send(None)
+                break
+            else:
+                raise ValueError(f"Unknown command {cmd} for the environment worker {rank}.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+
+
+class VecEnvWrapper:
+    def __init__(self, config, num_envs, seed=None, timeout=None):
+        """step num_envs EnvWrapper instances in subprocesses
+
+        Args:
+            config (dict): environment config shared by all instances
+            num_envs (int): number of subprocesses
+            seed (int): environment i is seeded with seed+i (default config['seed'])
+            timeout (float): seconds to wait for the reply of a worker before raising a TimeoutError
+                (default config['vec_worker_timeout'], None to wait forever)
+        """
+        self.config = config
+        self.num_envs = num_envs
+        self.timeout = config.get('vec_worker_timeout', 600.) if timeout is None else timeout
+        seed = config['seed'] if seed is None else seed
+
+        self.single_observation_space, self.single_action_space = get_spaces(config)
+        state_len = self.single_observation_space.shape[0]
+        action_num = self.single_action_space.n
+
+        shapes = [('float64', (num_envs, state_len)),   # states
+                  ('float64', (num_envs,)),             # rewards
+                  ('bool', (num_envs,)),                # new_slot flags
+                  ('bool', (num_envs, action_num)),     # action masks
+                  ('int64', (num_envs,))]               # actions
+        self._buffers = [mp.RawArray('b', int(np.prod(shape)) * np.dtype(d).itemsize) for d, shape in shapes]
+        self.states, self.rewards, self.new_slots, self.action_masks, self.actions = \
+            [np.frombuffer(b, dtype=d).reshape(shape) for b, (d, shape) in zip(self._buffers, shapes)]
+
+        self.remotes, self.processes = [], []
+        for rank in range(num_envs):
+            remote, work_remote = mp.Pipe()
+            process = mp.Process(target=_vec_worker, args=(rank, config, seed + rank, work_remote, remote, self._buffers, shapes), daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+        self.closed = False
+
+    def _recv(self, rank):
+        """the reply of a worker, raise a TimeoutError instead of blocking forever if it died or hung"""
+        remote = self.remotes[rank]
+        if self.timeout is not None and not remote.poll(self.timeout):
+            state = "died" if not self.processes[rank].is_alive() else "hung"
+            raise TimeoutError(f"The environment worker {rank} {state}, no reply in {self.timeout} seconds.")
+        return remote.recv()
+
+    def _broadcast(self, cmd):
+        for remote in self.remotes:
+            remote.send(cmd)
+        return [self._recv(rank) for rank in range(self.num_envs)]
+
+    def reset(self):
+        """
+        Returns:
+            states (np.array): (num_envs, state_len), a view of the shared buffer, copy it before the next step if it should be kept
+        """
+        self._broadcast('reset')
+        return self.states
+
+    def step_async(self, actions):
+        self.actions[:] = actions
+        for remote in self.remotes:
+            remote.send('step')
+
+    def step_wait(self):
+        for rank in range(self.num_envs):
+            self._recv(rank)
+        return self.states, self.rewards, self.new_slots
+
+    def step(self, actions):
+        """step all environments with one action each
+
+        Args:
+            actions (np.array): (num_envs,), -1 drops the current task
+
+        Returns:
+            states (np.array): (num_envs, state_len)
+            rewards (np.array): (num_envs,)
+            new_slots (np.array): (num_envs,) whether each environment entered a new slot
+            all of them are views of the shared buffers
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def log_episode_statistics(self):
+        return self._broadcast('statistics')
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._broadcast('close')
+        finally:
+            for process in self.processes:
+                process.join(self.timeout)
+                if process.is_alive():
+                    process.terminate()
+        self.closed = True
@@ -46,7 +46,8 @@ class EnvWrapper:
         # next_state, reward, terminal, _ = self.env.step(action.ravel())
         next_state, reward, enter_next_slot = self.env.step(action)
         if self.config['get_statistics']:
-            self.statistic(enter_next_slot)
+            with self.env.prof.timer('wrapper.statistic'):
+                self.statistic(enter_next_slot)
         return next_state, reward, enter_next_slot
 
     def set_random_seed(self, seed):
@@ -58,12 +59,17 @@ class EnvWrapper:
         pass
 
     def close(self):
-        # self.env.close()
-        pass
+        self.env.close()
 
     def get_action_space(self):
         return self.env.action_space
 
+    def get_observation_space(self):
+        return self.env.observation_space
+
+    def get_action_mask(self):
+        return self.env.get_action_mask()
+
     def normalise_state(self, state):
         return state
 
@@ -80,30 +86,18 @@ class EnvWrapper:
                 print(f"Serverd percent: {self.served_percent}, uesd resource of server: {self.uesd_resource_server}")
             
         env = self.env
-        M = self.config['M']
+        ledger = env.ledger
+        if enter_next_slot:
+            ledger.resync()
 
         self.served_percent = env.served_num / env.tasks_num
         
-        # occupation = [[],[],[]]
-        for device in env.workers:
-            for i in range(3):
-                occupation_rate = device.idle_resource_occupation_rate(i)
-                # occupation[i].append(occupation)
-                if device.id < self.config['M']:
-                    self.total_resource_server[i] += device.capacity[i]
-                    self.uesd_resource_server[i] += device.capacity[i] * occupation_rate
-                else:
-                    doCensus = False
-                    if i == 0 and not device.isMobile and device.isOpen:
-                        doCensus = True
-                    elif i == 1 and not device.isMobile:
-                        doCensus = True
-                    if doCensus:
-                        self.total_resource_other[i] += device.capacity[i]
-                        self.uesd_resource_other[i] += device.capacity[i] * occupation_rate
-        
-        # self.worker_occupation = [np.mean(occupation[0]), np.mean(occupation[1]), np.mean(occupation[2])]
-        # self.server_occupation = [np.mean(occupation[0][:M]), np.mean(occupation[1][:M]), np.mean(occupation[2][:M])]
+        # sum of capacity * occupation rate over the census workers, which equals capacity - remaining
+        for i in range(3):
+            self.total_resource_server[i] += ledger.capacity[0][i]
+            self.uesd_resource_server[i] += ledger.used(0, i)
+            self.total_resource_other[i] += ledger.capacity[1][i]
+            self.uesd_resource_other[i] += ledger.used(1, i)
     
     def log_episode_statistics(self):
         logs = {}
@@ -125,11 +119,23 @@ class EnvWrapper:
         logs['server_mem_rate'] = self.uesd_resource_server[1] / self.total_resource_server[1]
         logs['server_bw_rate'] = self.uesd_resource_server[2] / self.total_resource_server[2]
 
-        # start_delay, service_latency, speed, jilter
-        qos = np.array(self.env.finished_tasks_qos)
-        logs['start_delay'] = np.mean(qos[:, 0])
-        logs['service_latency'] = np.mean(qos[:, 1])
-        logs['speed'] = np.mean(qos[:, 2])
-        logs['jilter'] = np.mean(qos[:, 3])
+        # start_delay, service_latency, speed, jilter: means, std, quantiles and per task type
+        logs.update(self.env.qos_stats.summary())
+        
+        # layers pushed ahead of the requests, their hit rate and the fetch time they saved
+        if self.env.prefetcher is not None:
+            logs.update(self.env.prefetcher.summary())
+        # overhead of the redundant user data
+        if self.env.storage_stats is not None:
+            logs.update(self.env.storage_stats.summary())
+        # hit ratios of the edge caches
+        if self.env.edge_cache is not None:
+            logs.update(self.env.edge_cache.summary())
+        # completion times of the process tasks under processor sharing
+        if self.env.compute_time is not None:
+            logs.update(self.env.compute_time.summary())
+        
+        # per-phase wall time, calls and scanned items, empty if profiling is off
+        logs.update(self.env.prof.report())
 
         return logs
\ No newline at end of file
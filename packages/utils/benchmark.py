@@ -0,0 +1,301 @@
+import numpy as np
+import multiprocessing as mp
+import traceback
+import platform
+import subprocess
+import resource
+import sys
+import json
+import time
+import os
+from .sweep import expand_grid
+
+BENCHMARK_VERSION = 1
+
+# every case is simulated from the same seed, with a short fixed horizon
+BENCH_FIXED = {
+    'seed': 8888,
+    'num_ep_train': 1,
+    'max_slot_per_ep': 10,
+    'get_statistics': True,
+    'print_statistics_per_slot': 0,
+    'result_cache': 0,
+    'replay_buffer_size': 0,
+    'profile': 0,
+}
+
+BENCH_SPECS = [
+    {
+        # all cloud models x task types at a medium scale
+        'name': 'models',
+        'fixed': {'N': 400, 'M': 20, 'area_num': 5},
+        'grid': {'cloud_model': [0, 1, 2, 3, 4, 5], 'task_type': [0, 1, 2]},
+    },
+    {
+        # scaling in the number of clients
+        'name': 'scale_N',
+        'fixed': {'M': 30, 'area_num': 5, 'task_type': 2},
+        'grid': {'N': [250, 1000, 4000], 'cloud_model': [0, 3]},
+    },
+    {
+        # scaling in the number of servers
+        'name': 'scale_M',
+        'fixed': {'N': 1000, 'area_num': 5, 'task_type': 2},
+        'grid': {'M': [10, 40, 160], 'cloud_model': [0, 3]},
+    },
+    {
+        # scaling in the number of areas
+        'name': 'scale_area',
+        'fixed': {'N': 1000, 'M': 30, 'task_type': 2},
+        'grid': {'area_num': [2, 5, 20], 'cloud_model': [0, 3]},
+    },
+]
+
+# the smallest case of every spec, for a quick check
+QUICK_FIXED = {'max_slot_per_ep': 3}
+
+# direction of each metric: 1 if higher is better, -1 if lower is better
+BENCH_METRICS = {
+    'throughput': 1,            # tasks scheduled per second
+    'slot_time_mean': -1,       # ms
+    'slot_time_p95': -1,        # ms
+    'generation_time': -1,      # s, topology, devices & catalog
+    'peak_rss': -1,             # MB
+    'import_time': -1,          # ms, startup case only
+}
+
+# optional dependencies which should not be loaded by the simulator itself
+HEAVY_MODULES = ['gym', 'tensorboardX', 'torch', 'tensorflow']
+STARTUP_MODULE = 'packages.alg.engine'
+
+
+def case_name(spec_name, config):
+    return f"{spec_name}/cm{config['cloud_model']}_tt{config['task_type']}_N{config['N']}_M{config['M']}_A{config['area_num']}"
+
+
+def bench_cases(base_config, specs=BENCH_SPECS, quick=False):
+    """
+    Returns (list): [(case name, config), ...] in a stable order
+    """
+    cases = []
+    for spec in specs:
+        fixed = dict(BENCH_FIXED)
+        fixed.update(spec.get('fixed', {}))
+        if quick:
+            fixed.update(QUICK_FIXED)
+        configs = expand_grid(base_config, {'fixed': fixed, 'grid': spec['grid']})
+        if quick:
+            configs = configs[:1]
+        cases += [(case_name(spec['name'], config), config) for config in configs]
+    return cases
+
+
+def peak_rss():
+    """peak resident set size of this process (MB)"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB elsewhere
+    return rss / 2 ** 20 if platform.system() == 'Darwin' else rss / 2 ** 10
+
+
+def run_case(config):
+    """
+    Simulate one config with the greedy policy and time it. Meant to run in a fresh process,
+    so that the peak RSS belongs to this case only.
+
+    Returns (dict): BENCH_METRICS plus 'tasks', 'slots' and 'error' (None or the traceback)
+    """
+    from ..env.wrapper import EnvWrapper
+    from ..alg.agent import parse_states
+    from ..alg.sim.openraas_greedy import OPGreedy
+
+    try:
+        # the topology is drawn from the global generator before env.seed()
+        np.random.seed(config['seed'])
+        begin = time.perf_counter()
+        env = EnvWrapper(config)
+        env.seed(config['seed'])
+        generation_time = time.perf_counter() - begin
+
+        alg = OPGreedy()
+        tasks = 0
+        slot_times = []
+        begin = time.perf_counter()
+        for episode in range(config['num_ep_train']):
+            state = env.reset()
+            slot_begin = time.perf_counter()
+            while len(slot_times) < (episode + 1) * config['max_slot_per_ep']:
+                compute_bandwidth, candidates, valid = parse_states(state, config)
+                action = int(alg.get_actions(compute_bandwidth, candidates, valid)[0])
+                state, _, new_slot = env.step(action)
+                tasks += 1
+                if new_slot:
+                    now = time.perf_counter()
+                    slot_times.append(now - slot_begin)
+                    slot_begin = now
+            if config['get_statistics']:
+                env.log_episode_statistics()
+        duration = time.perf_counter() - begin
+
+        return {
+            'throughput': tasks / duration,
+            'slot_time_mean': float(np.mean(slot_times)) * 1000.,
+            'slot_time_p95': float(np.percentile(slot_times, 95)) * 1000.,
+            'generation_time': generation_time,
+            'peak_rss': peak_rss(),
+            'tasks': tasks,
+            'slots': len(slot_times),
+            'error': None,
+        }
+    except Exception:
+        return {'error': traceback.format_exc()}
+
+
+def run_benchmark(cases, repeat=1, on_result=None):
+    """
+    Run the cases one after another, each repetition in its own process, and keep the best repetition
+    (highest throughput) of every case.
+
+    Args:
+        cases (list): [(case name, config), ...]
+        repeat (int): repetitions per case
+        on_result: called with (case name, metrics) once a case is finished
+
+    Returns (dict): {case name: metrics}
+    """
+    results = {}
+    # sequential on purpose: concurrent cases would disturb each other's timings
+    with mp.Pool(1, maxtasksperchild=1) as pool:
+        for name, config in cases:
+            runs = [pool.apply(run_case, (config,)) for _ in range(repeat)]
+            ok = [r for r in runs if r['error'] is None]
+            results[name] = max(ok, key=lambda r: r['throughput']) if len(ok) else runs[0]
+            if on_result is not None:
+                on_result(name, results[name])
+    return results
+
+
+def import_time(module=STARTUP_MODULE, repeat=5):
+    """
+    Time the import of a module in fresh interpreters started from the repository root.
+
+    Returns (dict): 'import_time' (ms, best of the repetitions), 'import_time_median' (ms),
+        'heavy_modules' (HEAVY_MODULES loaded by the import), 'error'
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = (f"import sys, time, json; t = time.perf_counter(); import {module}; t = time.perf_counter() - t; "
+            f"print(json.dumps([t, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))")
+    times = []
+    heavy = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {'error': proc.stderr}
+        t, heavy = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(t * 1000.)
+    return {
+        'import_time': min(times),
+        'import_time_median': float(np.median(times)),
+        'heavy_modules': heavy,
+        'error': None,
+    }
+
+
+def environment_info():
+    info = {
+        'benchmark_version': BENCHMARK_VERSION,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+    try:
+        from .result_cache import code_version
+        info['code_version'] = code_version()
+    except Exception:
+        pass
+    return info
+
+
+def save_baseline(path, results, configs=None):
+    """
+    Args:
+        path (str): .json file
+        results (dict): {case name: metrics}
+        configs (dict): {case name: config}, stored for reference
+    """
+    dir = os.path.dirname(path)
+    if dir and not os.path.exists(dir):
+        os.makedirs(dir)
+    baseline = {'info': environment_info(), 'cases': results}
+    if configs is not None:
+        baseline['configs'] = configs
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp, path)
+
+
+def load_baseline(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare(baseline, current, tolerance=0.1, metrics=BENCH_METRICS):
+    """
+    Compare two benchmark results case by case.
+
+    Args:
+        baseline, current (dict): loaded baselines ({'cases': {case name: metrics}})
+        tolerance (float): relative change tolerated before a metric counts as a regression
+        metrics (dict): {metric: 1 if higher is better else -1}
+
+    Returns:
+        rows (list): [(case name, metric, baseline value, current value, relative change, status), ...]
+            relative change > 0 means better, status is 'ok', 'improved', 'regressed',
+            'error' (the case failed now but not in the baseline) or 'missing'
+        regressions (int): number of regressed or newly failing entries
+    """
+    rows = []
+    regressions = 0
+    base_cases, cur_cases = baseline['cases'], current['cases']
+    for name in sorted(set(base_cases) | set(cur_cases)):
+        base, cur = base_cases.get(name), cur_cases.get(name)
+        if base is None or cur is None:
+            rows.append((name, '', None, None, None, 'missing'))
+            continue
+        if cur.get('error') is not None:
+            status = 'error' if base.get('error') is None else 'ok'
+            regressions += status == 'error'
+            rows.append((name, 'error', None, None, None, status))
+            continue
+        if base.get('error') is not None:
+            rows.append((name, 'error', None, None, None, 'improved'))
+            continue
+        for metric, direction in metrics.items():
+            if metric not in base or metric not in cur:
+                continue
+            b, c = base[metric], cur[metric]
+            change = direction * (c - b) / abs(b) if b else 0.
+            if change < -tolerance:
+                status = 'regressed'
+                regressions += 1
+            elif change > tolerance:
+                status = 'improved'
+            else:
+                status = 'ok'
+            rows.append((name, metric, b, c, change, status))
+    return rows, regressions
+
+
+def format_rows(rows, only_changed=False):
+    lines = []
+    for name, metric, b, c, change, status in rows:
+        if only_changed and status == 'ok':
+            continue
+        if change is None:
+            lines.append(f"{status:>9}  {name}  {metric}")
+        else:
+            lines.append(f"{status:>9}  {name}  {metric}: {b:.4g} -> {c:.4g} ({change:+.1%})")
+    return '\n'.join(lines)
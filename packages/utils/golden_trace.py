@@ -0,0 +1,230 @@
+import numpy as np
+import gzip
+import json
+import copy
+import math
+
+# one record per task composed (or dropped by the policy) in Environment.step
+TRACE_FIELDS = ['episode', 'slot', 'index', 'user', 'type', 'action', 'compute', 'candidates', 'filestore', 'depositories', 'reward', 'qos']
+FLOAT_FIELDS = ['reward', 'qos']
+
+# statistics which depend on the wall clock instead of the simulation
+VOLATILE_PREFIXES = ['prof/']
+
+
+class TraceRecorder(object):
+
+    def __init__(self):
+        """
+        Collects the per-task decisions of an Environment, set it as env.recorder.
+        """
+        self.episode = -1
+        self.records = []
+        self.statistics = []    # one dict per finished episode
+
+    def start_episode(self):
+        self.episode += 1
+
+    def record(self, env, task, action, reward, qos=None):
+        """
+        Args:
+            env (Environment): the environment right after the task was composed, before the next state
+            task (Task): the stepped task
+            action (int): index of the filestore candidate, -1 for drop
+            reward (float)
+            qos (tuple): (start_delay, service_latency, speed, jilter) of a served task, None if dropped
+        """
+        self.records.append([
+            self.episode,
+            env.slot,
+            env.task_index,
+            task.user_id,
+            task.type,
+            int(action),
+            int(task.get_provider(0)),
+            [int(c) for c in env.fs_candidates],
+            int(task.get_provider(1)),
+            [int(d) for d in task.get_provider(2)],
+            float(reward),
+            [float(x) for x in qos] if qos is not None else None,
+        ])
+
+    def end_episode(self, logs):
+        self.statistics.append({k: float(v) for k, v in logs.items()})
+
+
+class GoldenTrace(object):
+
+    def __init__(self, config, records, statistics):
+        """
+        Decisions & episode statistics of one simulation, used as the reference of an equivalence check.
+
+        Args:
+            config (dict): config of the simulation
+            records (list): TraceRecorder.records, with TRACE_FIELDS columns
+            statistics (list): episode statistics
+        """
+        self.config = config
+        self.records = records
+        self.statistics = statistics
+
+    def save(self, path):
+        data = {'fields': TRACE_FIELDS, 'config': self.config, 'records': self.records, 'statistics': self.statistics}
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt') as f:
+            json.dump(data, f, default=str)
+
+    @staticmethod
+    def load(path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            data = json.load(f)
+        if data['fields'] != TRACE_FIELDS:
+            raise ValueError(f"The trace {path} has fields {data['fields']}, while {TRACE_FIELDS} are expected.")
+        return GoldenTrace(data['config'], data['records'], data['statistics'])
+
+
+def record_trace(config, env_factory=None):
+    """
+    Simulate a config with the greedy policy and record every decision.
+    The global np.random state is seeded by config['seed'] first, so that two calls with the same config
+    replay the same topology and tasks.
+
+    Args:
+        config (dict)
+        env_factory: function of the config returning an EnvWrapper-like engine (default EnvWrapper)
+
+    Returns (GoldenTrace)
+    """
+    from ..env.wrapper import EnvWrapper
+    from ..alg.agent import parse_states
+    from ..alg.sim.openraas_greedy import OPGreedy
+
+    config = copy.deepcopy(config)
+    np.random.seed(config['seed'])
+    env = (env_factory or EnvWrapper)(config)
+    env.seed(config['seed'])
+    recorder = TraceRecorder()
+    env.env.recorder = recorder
+
+    alg = OPGreedy()
+    for episode in range(config['num_ep_train']):
+        recorder.start_episode()
+        state = env.reset()
+        slots = 0
+        while slots < config['max_slot_per_ep']:
+            compute_bandwidth, candidates, valid = parse_states(state, config)
+            action = int(alg.get_actions(compute_bandwidth, candidates, valid)[0])
+            state, _, new_slot = env.step(action)
+            slots += new_slot
+        if config['get_statistics']:
+            recorder.end_episode(env.log_episode_statistics())
+    env.env.recorder = None
+
+    return GoldenTrace(config, recorder.records, recorder.statistics)
+
+
+def _close(a, b, rtol, atol):
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_close(x, y, rtol, atol) for x, y in zip(a, b))
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    if rtol == 0. and atol == 0.:
+        return a == b
+    return abs(a - b) <= atol + rtol * abs(b)
+
+
+def diff_record(ref, alt, rtol=0., atol=0., ignore=()):
+    """
+    Returns (list): names of the fields where two records differ, floats compared within atol + rtol * |ref|
+    """
+    fields = []
+    for name, a, b in zip(TRACE_FIELDS, ref, alt):
+        if name in ignore:
+            continue
+        same = _close(b, a, rtol, atol) if name in FLOAT_FIELDS else a == b
+        if not same:
+            fields.append(name)
+    return fields
+
+
+class Divergence(object):
+
+    def __init__(self, position, fields, ref, alt, context):
+        """
+        Args:
+            position (int): index of the first differing record
+            fields (list): differing fields of that record
+            ref, alt (list): the record in the reference & alternative traces (None if a trace ended)
+            context (list): the records preceding it, identical in both traces
+        """
+        self.position = position
+        self.fields = fields
+        self.ref = ref
+        self.alt = alt
+        self.context = context
+
+    def __str__(self):
+        lines = [f"First divergence at record {self.position} in {self.fields}:"]
+        for record in self.context:
+            lines.append(f"      {format_record(record)}")
+        lines.append(f"  ref {format_record(self.ref)}")
+        lines.append(f"  alt {format_record(self.alt)}")
+        return '\n'.join(lines)
+
+
+def format_record(record):
+    if record is None:
+        return '<end of trace>'
+    return ', '.join(f"{name}={value}" for name, value in zip(TRACE_FIELDS, record))
+
+
+def first_divergence(ref, alt, rtol=0., atol=0., context=3, ignore=()):
+    """
+    Args:
+        ref, alt (GoldenTrace): reference & alternative traces
+        rtol, atol (float): tolerance of the float fields, 0 for bit-for-bit equality
+        context (int): number of preceding records reported
+        ignore (list): fields left out of the comparison, e.g. ['reward', 'qos'] to compare decisions only
+
+    Returns (Divergence): None if the traces are equivalent
+    """
+    for i in range(max(len(ref.records), len(alt.records))):
+        r = ref.records[i] if i < len(ref.records) else None
+        a = alt.records[i] if i < len(alt.records) else None
+        fields = TRACE_FIELDS if r is None or a is None else diff_record(r, a, rtol, atol, ignore)
+        if len(fields):
+            return Divergence(i, fields, r, a, ref.records[max(0, i - context):i])
+    return None
+
+
+def compare_statistics(ref, alt, rtol=0., atol=0.):
+    """
+    Compare the episode statistics of two traces, ignoring the wall-clock ones.
+
+    Returns (list): [(episode, key, ref value, alt value), ...] of the mismatches
+    """
+    mismatches = []
+    if len(ref.statistics) != len(alt.statistics):
+        mismatches.append((-1, 'episodes', len(ref.statistics), len(alt.statistics)))
+    for episode, (r, a) in enumerate(zip(ref.statistics, alt.statistics)):
+        for key in sorted(set(r) | set(a)):
+            if any(key.startswith(p) for p in VOLATILE_PREFIXES):
+                continue
+            if key not in r or key not in a or not _close(a[key], r[key], rtol, atol):
+                mismatches.append((episode, key, r.get(key), a.get(key)))
+    return mismatches
+
+
+def check_equivalence(ref, alt, rtol=0., atol=0., ignore=()):
+    """
+    Returns:
+        divergence (Divergence): first differing decision, None if none
+        mismatches (list): see compare_statistics, empty if the float fields are ignored
+    """
+    divergence = first_divergence(ref, alt, rtol, atol, ignore=ignore)
+    if any(name in ignore for name in FLOAT_FIELDS):
+        return divergence, []
+    return divergence, compare_statistics(ref, alt, rtol, atol)
@@ -1,4 +1,3 @@
-from tensorboardX import SummaryWriter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,6 +12,8 @@ class Logger(object):
         Args:
             log_dir (str): log directory
         """
+        # tensorboardX is slow to import, load it only when an event file is actually written
+        from tensorboardX import SummaryWriter
         self.writer = SummaryWriter(log_dir)
         self.info = logger.info
         self.debug = logger.debug
@@ -39,6 +40,9 @@ class Logger(object):
         # print(tag, scalar_dict, step)
         self.writer.add_scalars(tag, scalar_dict, step)
 
+    def flush(self):
+        self.writer.flush()
+
     def close(self):
         self.writer.close()
 
@@ -0,0 +1,143 @@
+import time
+
+
+class _Timer(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add(self.name, time.perf_counter() - self.begin)
+
+
+class Profiler(object):
+
+    def __init__(self):
+        """
+        Named wall-time timers and counters of the simulation hot paths, aggregated per slot and per episode.
+
+        Phases are timed either with the lap API (mark() then lap(name) at each phase boundary, no
+        indentation of the timed code needed), or with the timer(name) context manager.
+        Items count how many objects (workers, hosts...) a phase scanned.
+        """
+        self.enabled = True
+        self.timers = {}
+        self.reset()
+
+    def reset(self):
+        self.episode = {}   # key: phase name, value: [seconds, calls, items]
+        self.slot_times = []
+        self.slot_begin = time.perf_counter()
+        self.slot_recorded = False  # whether a phase was timed or counted since slot_begin
+        self.last = self.slot_begin
+
+    def _entry(self, name):
+        entry = self.episode.get(name)
+        if entry is None:
+            entry = self.episode[name] = [0., 0, 0]
+        return entry
+
+    def add(self, name, seconds, items=0):
+        entry = self._entry(name)
+        entry[0] += seconds
+        entry[1] += 1
+        entry[2] += items
+        self.slot_recorded = True
+
+    def count(self, name, items):
+        self._entry(name)[2] += items
+        self.slot_recorded = True
+
+    def mark(self):
+        self.last = time.perf_counter()
+
+    def lap(self, name, items=0):
+        """attribute the time since the last mark() or lap() to the phase name"""
+        now = time.perf_counter()
+        self.add(name, now - self.last, items)
+        self.last = now
+
+    def timer(self, name):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = _Timer(self, name)
+        return timer
+
+    def end_slot(self):
+        """close the current slot, skipped if it recorded nothing (e.g. the one opened by reset())"""
+        now = time.perf_counter()
+        if self.slot_recorded:
+            self.slot_times.append(now - self.slot_begin)
+        self.slot_begin = now
+        self.slot_recorded = False
+
+    def report(self, prefix='prof/'):
+        """
+        Returns (dict):
+            '{prefix}{phase}_time' (ms in the episode), '{prefix}{phase}_time_per_slot' (ms),
+            '{prefix}{phase}_calls', '{prefix}{phase}_items', '{prefix}{phase}_items_per_slot',
+            '{prefix}slots', '{prefix}slot_time_mean', '{prefix}slot_time_max' (ms)
+        """
+        slots = max(len(self.slot_times), 1)
+        logs = {}
+        for name, (seconds, calls, items) in sorted(self.episode.items()):
+            logs[f"{prefix}{name}_time"] = seconds * 1000.
+            logs[f"{prefix}{name}_time_per_slot"] = seconds * 1000. / slots
+            logs[f"{prefix}{name}_calls"] = calls
+            logs[f"{prefix}{name}_items"] = items
+            logs[f"{prefix}{name}_items_per_slot"] = items / slots
+        logs[f"{prefix}slots"] = len(self.slot_times)
+        logs[f"{prefix}slot_time_mean"] = sum(self.slot_times) * 1000. / slots
+        logs[f"{prefix}slot_time_max"] = max(self.slot_times) * 1000. if len(self.slot_times) else 0.
+        return logs
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class NullProfiler(Profiler):
+
+    def __init__(self):
+        """Disabled profiler, every method is a no-op"""
+        self.enabled = False
+        self.null_timer = _NullTimer()
+
+    def reset(self):
+        pass
+
+    def add(self, name, seconds, items=0):
+        pass
+
+    def count(self, name, items):
+        pass
+
+    def mark(self):
+        pass
+
+    def lap(self, name, items=0):
+        pass
+
+    def timer(self, name):
+        return self.null_timer
+
+    def end_slot(self):
+        pass
+
+    def report(self, prefix='prof/'):
+        return {}
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def create_profiler(config):
+    return Profiler() if config.get('profile', 0) else NULL_PROFILER
@@ -0,0 +1,209 @@
+import numpy as np
+import os
+
+
+class SumTree(object):
+    def __init__(self, capacity):
+        """
+        Binary sum tree over capacity leaves, used for prioritized sampling.
+        Node i has children 2i and 2i+1, the leaves start at self.leaf_base.
+
+        Args:
+            capacity (int): number of leaves
+        """
+        self.capacity = capacity
+        self.depth = int(np.ceil(np.log2(max(capacity, 2))))
+        self.leaf_base = 1 << self.depth
+        self.tree = np.zeros(2 * self.leaf_base, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def update(self, indices, priorities):
+        """
+        Set the priorities of leaves and refresh their ancestors level by level.
+
+        Args:
+            indices (np.array): leaf indices in [0, capacity)
+            priorities (np.array): new priorities
+        """
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaf_base
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes >> 1)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        """
+        Descend the tree for each prefix-sum value in [0, total).
+
+        Returns (np.array): leaf indices
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            go_right = values >= left
+            values -= left * go_right
+            nodes = 2 * nodes + go_right
+        # rounding may reach an empty leaf at the right end
+        return np.minimum(nodes - self.leaf_base, self.capacity - 1)
+
+
+class ReplayBuffer(object):
+
+    def __init__(self, capacity, state_dim, path=None, dtype=np.float32, rng=None):
+        """
+        Preallocated ring buffer of (state, action, reward, next_state, mask) transitions.
+
+        Args:
+            capacity (int): maximum number of transitions, the oldest ones are overwritten
+            state_dim (int): length of a state vector
+            path (str): if given, the arrays are memory-mapped files in this directory
+            dtype: storage type of states and rewards
+            rng: generator drawing the samples, e.g. the 'replay' stream of the environment (default the global np.random state)
+        """
+        self.capacity = capacity
+        self.rng = np.random if rng is None else rng
+        self.state_dim = state_dim
+        self.path = path
+        self.pointer = 0
+        self.size = 0
+
+        self.states = self._allocate('states', (capacity, state_dim), dtype)
+        self.actions = self._allocate('actions', (capacity,), np.int64)
+        self.rewards = self._allocate('rewards', (capacity,), dtype)
+        self.next_states = self._allocate('next_states', (capacity, state_dim), dtype)
+        self.masks = self._allocate('masks', (capacity,), dtype)   # 0 where the trajectory breaks
+
+    def _allocate(self, name, shape, dtype):
+        if not self.path:
+            return np.zeros(shape, dtype=dtype)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        return np.memmap(f"{self.path}/{name}.dat", dtype=dtype, mode='w+', shape=shape)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, mask):
+        """
+        Store one transition.
+        """
+        i = self.pointer
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.masks[i] = mask
+        self._advance(np.array([i]))
+
+    def add_batch(self, states, actions, rewards, next_states, masks):
+        """
+        Store a batch of transitions, e.g. one step of VecEnvWrapper.
+
+        Args:
+            states (np.array): (batch, state_dim)
+            actions, rewards, masks (np.array): (batch,)
+            next_states (np.array): (batch, state_dim)
+        """
+        n = len(actions)
+        if n > self.capacity:
+            raise ValueError(f"Batch size {n} is larger than the buffer capacity {self.capacity}.")
+        indices = (self.pointer + np.arange(n)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.masks[indices] = masks
+        self._advance(indices)
+
+    def _advance(self, indices):
+        n = len(indices)
+        self.pointer = (self.pointer + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def _gather(self, indices):
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.masks[indices])
+
+    def sample(self, batch_size):
+        """
+        Uniformly sample a batch.
+
+        Returns (tuple): states, actions, rewards, next_states, masks
+        """
+        if self.size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer.")
+        indices = self.rng.randint(0, self.size, size=batch_size)
+        return self._gather(indices)
+
+    def flush(self):
+        if self.path:
+            for array in [self.states, self.actions, self.rewards, self.next_states, self.masks]:
+                array.flush()
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+
+    def __init__(self, capacity, state_dim, path=None, dtype=np.float32, alpha=0.6, beta=0.4, eps=1e-6, rng=None):
+        """
+        Replay buffer sampling transitions proportionally to priority^alpha.
+
+        Args:
+            alpha (float): how much prioritization is used, 0 is uniform
+            beta (float): importance-sampling correction exponent
+            eps (float): added to priorities so that every transition keeps a chance to be sampled
+        """
+        super().__init__(capacity, state_dim, path, dtype, rng)
+        self.alpha = alpha
+        self.beta = beta
+        self.eps = eps
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.
+
+    def _advance(self, indices):
+        # new transitions get the maximum priority so that they are seen at least once
+        self.tree.update(indices, np.full(len(indices), self.max_priority ** self.alpha))
+        super()._advance(indices)
+
+    def sample(self, batch_size):
+        """
+        Stratified sampling over the sum tree.
+
+        Returns (tuple): states, actions, rewards, next_states, masks, weights, indices
+        """
+        if self.size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer.")
+        total = self.tree.total()
+        bounds = np.arange(batch_size) * (total / batch_size)
+        values = bounds + self.rng.rand(batch_size) * (total / batch_size)
+        # rounding may reach an empty leaf past the stored transitions
+        indices = np.minimum(self.tree.find(values), self.size - 1)
+
+        # a leaf at zero priority would get an infinite weight
+        priorities = np.maximum(self.tree.tree[indices + self.tree.leaf_base], self.eps ** self.alpha)
+        weights = (self.size * priorities / total) ** (-self.beta)
+        finite = np.isfinite(weights)
+        weights = np.minimum(weights / weights[finite].max(), 1.) if finite.any() else np.ones(batch_size)
+        return self._gather(indices) + (weights, indices)
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.tree.update(indices, priorities ** self.alpha)
+
+
+def create_replay_buffer(config, state_dim, rng=None):
+    """
+    Build the replay buffer described by the config, None if config['replay_buffer_size'] is 0.
+    rng draws the samples, e.g. env.streams.get('replay')
+    """
+    capacity = config.get('replay_buffer_size', 0)
+    if not capacity:
+        return None
+    path = config.get('replay_buffer_path', '') or None
+    if config.get('prioritized_replay', 0):
+        return PrioritizedReplayBuffer(capacity, state_dim, path,
+                                       alpha=config.get('per_alpha', 0.6), beta=config.get('per_beta', 0.4), rng=rng)
+    return ReplayBuffer(capacity, state_dim, path, rng=rng)
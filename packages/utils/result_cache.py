@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+
+CACHE_VERSION = 1   # bump it when the meaning of cached logs changes without any code change in packages/
+
+# keys that never change the simulation results
+IGNORED_KEYS = ['log_pretext', 'results_path', 'print_statistics_per_slot', 'result_cache', 'result_cache_path']
+
+# keys naming a trace file (or a directory of them) read by the simulation, whose contents take part in the key
+TRACE_KEYS = ['replay_workload', 'external_trace']
+
+_code_version = None
+
+
+def code_version():
+    """
+    Tag of the simulator code: hash of every .py file under packages/ plus CACHE_VERSION.
+    Computed once per process.
+    """
+    global _code_version
+    if _code_version is None:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        h = hashlib.sha256(str(CACHE_VERSION).encode())
+        for dir, dirs, files in sorted(os.walk(root)):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.join(dir, name)
+                    h.update(os.path.relpath(path, root).encode())
+                    with open(path, 'rb') as f:
+                        h.update(f.read())
+        _code_version = h.hexdigest()[:16]
+    return _code_version
+
+
+def file_digest(path):
+    """
+    Hash of the contents of a file, or of every file under a directory (names included).
+    """
+    h = hashlib.sha256()
+    if os.path.isdir(path):
+        paths = []
+        for dir, dirs, files in sorted(os.walk(path)):
+            dirs.sort()
+            paths += [os.path.join(dir, name) for name in sorted(files)]
+    else:
+        paths = [path]
+    for file in paths:
+        h.update(os.path.relpath(file, path).encode())
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def config_key(config, version):
+    """
+    Canonical hash of a config dict. All keys take part in it, so adding or removing a config key
+    (a schema change) invalidates every entry as well.
+    The traces named by TRACE_KEYS take part by their contents, so a rewritten trace misses the cache.
+    """
+    canonical = json.dumps({k: v for k, v in config.items() if k not in IGNORED_KEYS}, sort_keys=True, default=str)
+    traces = ''.join(f":{k}={file_digest(config[k])}" for k in TRACE_KEYS if config.get(k, ''))
+    return hashlib.sha256(f"{version}:{canonical}{traces}".encode()).hexdigest()
+
+
+class ResultCache(object):
+
+    def __init__(self, path, version=None):
+        """
+        Content-addressed store of simulation logs, one JSON file per config.
+        Entries are written atomically, so an interrupted sweep resumes from the finished configs.
+
+        Args:
+            path (str): cache directory
+            version (str): code version tag (default code_version())
+        """
+        self.path = path
+        self.version = code_version() if version is None else version
+        if not os.path.exists(path):
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, config):
+        return os.path.join(self.path, config_key(config, self.version) + '.json')
+
+    def get(self, config):
+        """
+        Returns (dict): cached logs of this config, None if missing
+        """
+        file = self._file(config)
+        if not os.path.exists(file):
+            return None
+        try:
+            with open(file, 'r') as f:
+                return json.load(f)['logs']
+        except (ValueError, KeyError):
+            # a broken entry is seen as missing and will be overwritten
+            return None
+
+    def put(self, config, logs):
+        file = self._file(config)
+        record = {
+            'version': self.version,
+            'config': config,
+            'logs': {k: float(v) for k, v in logs.items()},
+        }
+        tmp = f"{file}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp, file)
@@ -0,0 +1,127 @@
+import numpy as np
+import sqlite3
+import json
+import time
+import os
+
+# config keys copied into their own columns of the runs table, so that they can be filtered & pivoted on
+RUN_COLUMNS = {
+    'log_pretext': 'TEXT',
+    'N': 'INTEGER',
+    'M': 'INTEGER',
+    'area_num': 'INTEGER',
+    'cloud_model': 'INTEGER',
+    'task_type': 'INTEGER',
+    'worker_rate': 'REAL',
+    'public_data_deduplication': 'INTEGER',
+    'seed': 'INTEGER',
+}
+
+
+class ResultsStore(object):
+
+    def __init__(self, path, batch_size=32):
+        """
+        Append-only local store of simulation results in SQLite.
+        runs: one row per finished config (selected config columns, full config json, timing)
+        metrics: one row per (run, metric name)
+
+        Args:
+            path (str): database file
+            batch_size (int): number of runs buffered before they are written in one transaction
+        """
+        dir = os.path.dirname(path)
+        if dir and not os.path.exists(dir):
+            os.makedirs(dir)
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        self.conn = sqlite3.connect(path)
+        columns = ''.join([f"{k} {t}, " for k, t in RUN_COLUMNS.items()])
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL, {columns}duration REAL, config TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS metrics (run_id INTEGER, name TEXT, value REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS metrics_name ON metrics (name, run_id)")
+        self.conn.commit()
+
+    def add(self, logs, config, duration=None):
+        """
+        Buffer one finished config.
+
+        Args:
+            logs (dict): {metric name: value}
+            config (dict): config of the run
+            duration (float): wall time of the run (s)
+        """
+        self.pending.append((time.time(), logs, config, duration))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not len(self.pending):
+            return
+        keys = list(RUN_COLUMNS.keys())
+        with self.conn:
+            for created, logs, config, duration in self.pending:
+                cursor = self.conn.execute(
+                    f"INSERT INTO runs (created, {', '.join(keys)}, duration, config) VALUES ({', '.join(['?'] * (len(keys) + 3))})",
+                    [created] + [config.get(k) for k in keys] + [duration, json.dumps(config, sort_keys=True, default=str)])
+                self.conn.executemany("INSERT INTO metrics (run_id, name, value) VALUES (?, ?, ?)",
+                                      [(cursor.lastrowid, k, float(v)) for k, v in logs.items()])
+        self.pending.clear()
+
+    def _where(self, where):
+        clauses, params = [], []
+        for k, v in where.items():
+            if k not in RUN_COLUMNS:
+                raise KeyError(f"Cannot filter on {k}, which is not one of {list(RUN_COLUMNS.keys())}.")
+            clauses.append(f"runs.{k} = ?")
+            params.append(v)
+        return (' AND ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, metric, where={}):
+        """
+        Returns (list): [(run_id, {run column: value}, metric value), ...] of the runs matching where
+        """
+        self.flush()
+        keys = list(RUN_COLUMNS.keys())
+        clause, params = self._where(where)
+        rows = self.conn.execute(
+            f"SELECT runs.run_id, {', '.join(['runs.' + k for k in keys])}, metrics.value FROM runs JOIN metrics ON runs.run_id = metrics.run_id "
+            f"WHERE metrics.name = ?{clause} ORDER BY runs.run_id", [metric] + params).fetchall()
+        return [(row[0], dict(zip(keys, row[1:-1])), row[-1]) for row in rows]
+
+    def pivot(self, metric, index='N', columns='cloud_model', where={}):
+        """
+        Pivot a metric, averaging repeated runs of the same cell.
+
+        Args:
+            metric (str): e.g. 'drop_rate'
+            index (str): run column along the rows
+            columns (str): run column along the columns
+            where (dict): {run column: value} filters, e.g. {'log_pretext': 'change_N_2'}
+
+        Returns:
+            index_values (list)
+            column_values (list)
+            table (np.array): (len(index_values), len(column_values)), nan for missing cells
+        """
+        for k in [index, columns]:
+            if k not in RUN_COLUMNS:
+                raise KeyError(f"Cannot pivot on {k}, which is not one of {list(RUN_COLUMNS.keys())}.")
+        rows = self.query(metric, where)
+        index_values = sorted(set(r[1][index] for r in rows))
+        column_values = sorted(set(r[1][columns] for r in rows))
+        sums = np.zeros((len(index_values), len(column_values)))
+        counts = np.zeros((len(index_values), len(column_values)))
+        for _, run, value in rows:
+            i = index_values.index(run[index])
+            j = column_values.index(run[columns])
+            sums[i, j] += value
+            counts[i, j] += 1
+        with np.errstate(invalid='ignore'):
+            table = sums / counts
+        return index_values, column_values, table
+
+    def close(self):
+        self.flush()
+        self.conn.close()
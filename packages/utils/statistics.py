@@ -0,0 +1,209 @@
+import numpy as np
+import math
+
+QOS_METRICS = ['start_delay', 'service_latency', 'speed', 'jilter']
+TASK_TYPE_NAMES = ['process', 'storage', 'desktop']
+QUANTILES = [0.5, 0.95, 0.99]
+QUANTILE_SUFFIXES = tuple(f"_p{int(q * 100)}" for q in QUANTILES)  # of the quantile keys of QoSStatistics.summary
+
+
+class RunningStats(object):
+
+    def __init__(self):
+        """
+        Running count, mean and variance (Welford), mergeable with Chan's formula.
+        """
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def push(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def variance(self):
+        return self.m2 / self.count if self.count else float('nan')
+
+
+class QuantileSketch(object):
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048, min_value=1e-9):
+        """
+        Mergeable quantile sketch with logarithmic buckets (DDSketch-like).
+        Quantiles are within relative_accuracy of the true value, memory is bounded by max_buckets
+        (the lowest buckets are collapsed when it is exceeded).
+        Values below min_value, including zero and negatives, are counted in a zero bucket.
+
+        Args:
+            relative_accuracy (float): relative error of the returned quantiles
+            max_buckets (int): maximum number of non-empty buckets
+            min_value (float): the smallest value told apart from zero
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.buckets = {}   # key: bucket index, value: count
+        self.zero_count = 0
+        self.count = 0
+
+    def push(self, x):
+        self.count += 1
+        if x < self.min_value:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(x) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.buckets)
+        extra = len(keys) - self.max_buckets
+        moved = sum(self.buckets.pop(k) for k in keys[:extra + 1])
+        self.buckets[keys[extra]] = moved
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError(f"Cannot merge sketches with different accuracy {self.relative_accuracy} and {other.relative_accuracy}.")
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        while len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class QoSStatistics(object):
+
+    def __init__(self, cloud_model=''):
+        """
+        Constant-memory statistics of the QoS of served tasks, grouped by (cloud model, task type).
+        Mergeable across episodes and processes.
+
+        Args:
+            cloud_model (str): label of the cloud model producing the following samples
+        """
+        self.cloud_model = cloud_model
+        self.groups = {}    # key: (cloud_model, task_type), value: {metric: (RunningStats, QuantileSketch)}
+
+    def reset(self):
+        self.groups.clear()
+
+    def add(self, task_type, start_delay, service_latency, speed, jilter):
+        key = (self.cloud_model, task_type)
+        if key not in self.groups:
+            self.groups[key] = {m: (RunningStats(), QuantileSketch()) for m in QOS_METRICS}
+        group = self.groups[key]
+        for m, x in zip(QOS_METRICS, [start_delay, service_latency, speed, jilter]):
+            stats, sketch = group[m]
+            stats.push(x)
+            sketch.push(x)
+
+    def merge(self, other):
+        for key, group in other.groups.items():
+            if key not in self.groups:
+                self.groups[key] = {m: (RunningStats(), QuantileSketch()) for m in QOS_METRICS}
+            for m in QOS_METRICS:
+                self.groups[key][m][0].merge(group[m][0])
+                self.groups[key][m][1].merge(group[m][1])
+
+    def count(self):
+        return sum(group[QOS_METRICS[0]][0].count for group in self.groups.values())
+
+    def _combine(self, cloud_model=None, task_type=None):
+        combined = {m: (RunningStats(), QuantileSketch()) for m in QOS_METRICS}
+        for (cm, tt), group in self.groups.items():
+            if (cloud_model is not None and cm != cloud_model) or (task_type is not None and tt != task_type):
+                continue
+            for m in QOS_METRICS:
+                combined[m][0].merge(group[m][0])
+                combined[m][1].merge(group[m][1])
+        return combined
+
+    def summary(self, cloud_model=None):
+        """
+        Returns (dict):
+            '{metric}': mean over all task types
+            '{metric}_std', '{metric}_p50', '{metric}_p95', '{metric}_p99'
+            '{task type}/{metric}' and '{task type}/{metric}_p95' for every task type seen
+        """
+        logs = {}
+        for m, (stats, sketch) in self._combine(cloud_model).items():
+            logs[m] = stats.mean if stats.count else float('nan')
+            logs[f"{m}_std"] = math.sqrt(stats.variance()) if stats.count else float('nan')
+            for q in QUANTILES:
+                logs[f"{m}_p{int(q * 100)}"] = sketch.quantile(q)
+        for tt in sorted(set(tt for (_, tt) in self.groups)):
+            for m, (stats, sketch) in self._combine(cloud_model, tt).items():
+                logs[f"{TASK_TYPE_NAMES[tt]}/{m}"] = stats.mean
+                logs[f"{TASK_TYPE_NAMES[tt]}/{m}_p95"] = sketch.quantile(0.95)
+        return logs
+
+
+class StorageStatistics(object):
+
+    def __init__(self):
+        """
+        Overhead of the redundant storage (replicas or erasure-coded fragments) of the user data of storage tasks.
+        """
+        self.reset()
+
+    def reset(self):
+        self.tasks = 0
+        self.user_size = 0.
+        self.stored_size = 0.
+        self.degraded = 0
+        self.striped = 0
+
+    def add(self, user_size, stored_size, degraded=False, striped=False):
+        """
+        Args:
+            user_size (float): data uploaded by the user (MB)
+            stored_size (float): data stored over all devices (MB)
+            degraded (bool): whether fewer devices than required were found
+            striped (bool): whether the erasure-coded data was split over fewer than k devices, without any parity
+        """
+        self.tasks += 1
+        self.user_size += user_size
+        self.stored_size += stored_size
+        self.degraded += degraded
+        self.striped += striped
+
+    def summary(self):
+        """
+        Returns (dict):
+            'redundancy/overhead': stored over user data, 1 without redundancy
+            'redundancy/degraded_rate': share of the storage tasks stored with less redundancy than required
+            'redundancy/striped_rate': share of the storage tasks striped without parity, not counted as degraded
+        """
+        return {
+            'redundancy/overhead': self.stored_size / self.user_size if self.user_size else float('nan'),
+            'redundancy/degraded_rate': self.degraded / self.tasks if self.tasks else float('nan'),
+            'redundancy/striped_rate': self.striped / self.tasks if self.tasks else float('nan'),
+        }
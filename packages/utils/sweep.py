@@ -0,0 +1,100 @@
+import numpy as np
+import multiprocessing as mp
+import itertools
+import copy
+import json
+import os
+
+
+def expand_grid(base_config, spec):
+    """
+    Expand a declarative sweep spec into config dicts.
+
+    Args:
+        base_config (dict): config shared by the whole sweep
+        spec (dict): {
+            'fixed': {key: value},          # overrides applied to every config
+            'grid': [{key: [values]}, ...]  # cartesian product inside each dict, union over the list
+        }
+
+    Returns (list): configs
+    """
+    grids = spec.get('grid', [{}])
+    if isinstance(grids, dict):
+        grids = [grids]
+
+    configs = []
+    for grid in grids:
+        keys = list(grid.keys())
+        for values in itertools.product(*[grid[k] for k in keys]):
+            config = copy.deepcopy(base_config)
+            config.update(copy.deepcopy(spec.get('fixed', {})))
+            config.update(dict(zip(keys, values)))
+            configs.append(config)
+    return configs
+
+
+def estimate_cost(config):
+    """
+    Rough relative run time of a config: simulated tasks x devices scanned per task.
+    Compute workers are searched among the servers, plus the volunteer clients in OpenRaaS,
+    and only inside the client's area when computing at the edge.
+    """
+    tasks = config['N'] * config['num_ep_train'] * config['max_slot_per_ep']
+    scanned = config['M']
+    if config['cloud_model'] == 0:
+        scanned += config['N'] * config['worker_rate']
+    if config['cloud_model'] not in [1, 2] and config['compute_at_edge']:
+        scanned /= config['area_num']
+    return tasks * (1. + scanned)
+
+
+def order_by_cost(configs):
+    """longest job first, so that stragglers start early and the pool drains evenly
+    configs of equal cost keep their order, as in the baseline sweep"""
+    costs = np.array([estimate_cost(config) for config in configs], dtype=np.float64)
+    return [configs[i] for i in np.argsort(-costs, kind='stable')]
+
+
+class StreamingResultWriter(object):
+
+    def __init__(self, path):
+        """
+        Append one JSON line per finished config, flushed immediately.
+
+        Args:
+            path (str): .jsonl file
+        """
+        dir = os.path.dirname(path)
+        if dir and not os.path.exists(dir):
+            os.makedirs(dir)
+        self.file = open(path, 'a')
+
+    def write(self, logs, config, duration=None):
+        record = {'config': config, 'logs': {k: float(v) for k, v in logs.items()}, 'duration': duration}
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_sweep(configs, func, processes, on_result, initializer=None, initargs=()):
+    """
+    Run func over the configs in a process pool and hand every result to on_result as soon as it finishes.
+
+    Args:
+        configs (list): config dicts, dispatched longest job first
+        func: picklable function taking a config
+        processes (int): pool size
+        on_result: called in the parent process with each return value of func, in completion order
+        initializer, initargs: forwarded to mp.Pool
+
+    Returns (int): number of finished configs
+    """
+    finished = 0
+    with mp.Pool(processes, initializer=initializer, initargs=initargs) as pool:
+        for ret in pool.imap_unordered(func, order_by_cost(configs), chunksize=1):
+            on_result(ret)
+            finished += 1
+    return finished
@@ -0,0 +1,18 @@
+import os
+import pytest
+import numpy as np
+from packages.utils.utils import read_config
+from packages.env.openraas.catalog import set_shared_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def config(tmp_path):
+    """config.yml shrunk to a few slots of a small topology, seeded streams, results under tmp_path"""
+    config = read_config(os.path.join(ROOT, 'config.yml'))
+    config.update(M=10, N=100, num_ep_train=1, max_slot_per_ep=3, rng_streams=1, cloud_model=0,
+                  results_path=str(tmp_path), tensorboard_sink=0)
+    set_shared_catalog(None)
+    np.random.seed(config['seed'])
+    return config
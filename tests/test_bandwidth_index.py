@@ -0,0 +1,20 @@
+import numpy as np
+from packages.env.openraas.environment import Environment
+
+
+def test_range_query_matches_point_queries(config):
+    env = Environment(dict(config, task_type=2, bandwidth_index=1))
+    env.reset()
+    # consume bandwidth so that the lines and backbones are left with different headroom
+    for _ in range(20):
+        env.step(0)
+    topology = env.topology
+    indexed = [device for device in env.workers if not device.isMobile and device.isOpen]
+    for client in env.devices[::7]:
+        area = topology.device_to_area[client.id]
+        # get_state only queries bandwidths the client's own line can carry
+        for bandwidth in [0., .5, 2., 8., 1e9]:
+            if bandwidth > client.bw:
+                continue
+            expected = [device.id for device in indexed if topology.get_link_bandwidth_between_devices(client, device) >= bandwidth]
+            assert sorted(topology.bandwidth_index.reachable_with(area, bandwidth)) == expected
@@ -0,0 +1,11 @@
+import numpy as np
+from packages.env.openraas.catalog import Catalog
+
+
+def test_seeded_catalog_ignores_the_global_state():
+    np.random.seed(0)
+    a = Catalog(seed=3)
+    np.random.seed(1)
+    b = Catalog(seed=3)
+    assert np.array_equal(a.app_size, b.app_size) and np.array_equal(a.app_type, b.app_type)
+    assert a.app_layers == b.app_layers
@@ -0,0 +1,29 @@
+import pytest
+from packages.env.openraas.compute_time import ProcessorSharingClock
+
+
+def test_processor_sharing_completion_times():
+    clock = ProcessorSharingClock()
+    # alone, a task of 2 GFLOP on 1 GigaFlops runs 2 s
+    assert clock.add(0., 2., 1.) == pytest.approx(2000.)
+    # at 1 s the first task has 1 GFLOP left: both run at half speed until it leaves at 3 s, then the second one alone
+    assert clock.add(1000., 3., 1.) == pytest.approx(5000.)
+    # a smaller task arriving later leaves first, its estimate only counts the service up to its own tag
+    assert clock.add(2000., .2, 1.) == pytest.approx(2600.)
+
+
+def test_completion_time_is_a_lower_bound():
+    alone = ProcessorSharingClock()
+    estimate = alone.add(0., 2., 1.)
+    # nothing else arrived: the task leaves at its estimate
+    alone.advance(estimate - 1e-6)
+    assert len(alone.tags) == 1
+    alone.advance(estimate + 1e-6)
+    assert len(alone.tags) == 0
+
+    shared = ProcessorSharingClock()
+    estimate = shared.add(0., 2., 1.)
+    shared.add(500., 2., 1.)
+    shared.advance(estimate)
+    # a later arrival delays it, it is still running at its estimate
+    assert len(shared.tags) == 2
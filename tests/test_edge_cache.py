@@ -0,0 +1,37 @@
+from packages.env.openraas.environment import Environment
+
+
+def cacheable(env, area_id):
+    """an edge worker with default timers and an app it lacks whose first layer it can hold beforehand"""
+    for device in env.edge_cache.candidates[area_id]:
+        if device.default_timer < 0:
+            continue
+        for app in env.appList.apps:
+            if app not in device.apps and len(app.env_layers) and app.env_layers[0] not in device.layers \
+                    and env.edge_cache.closest_host(device, app) is not None:
+                return device, app
+    return None, None
+
+
+def test_eviction_gives_layers_back_to_timers(config):
+    env = Environment(dict(config, cloud_model=5, compute_at_edge=1, edge_cache=1, edge_cache_admission=0))
+    env.reset()
+    cache = env.edge_cache
+    area_id, (device, app) = next((a, cacheable(env, a)) for a in range(len(cache.candidates)) if cacheable(env, a)[0] is not None)
+    held = app.env_layers[0]
+    device.fetch_layer(held)
+    # room for the fill without evicting anything
+    device.mem += cache.fill_size(device, app)
+    cache.candidates[area_id] = [device]
+
+    assert cache.fill(area_id, app)
+    entry = cache.entries[area_id][app.id]
+    assert held not in entry.layers
+    assert all(device.timers[device.layers.index(layer)] == -1 for layer in app.env_layers)
+
+    cache.evict(area_id, entry)
+    # the layer held before the fill stays, under the timer of the device again
+    assert held in device.layers
+    assert device.timers[device.layers.index(held)] == device.default_timer
+    assert all(layer not in device.layers for layer in entry.layers)
+    assert not any(key[0] == device.id for key in cache.pins)
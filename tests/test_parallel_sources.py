@@ -0,0 +1,23 @@
+import pytest
+from packages.env.openraas.environment import Environment
+
+
+def test_chunks_arrive_together(config):
+    env = Environment(config)
+    topology = env.topology
+    area = topology.areas[topology.device_to_area[env.workers[0].id]]
+    device, *sources = [env.devices[d] for d in area.devices[:5]]
+    late = sources[-1]
+    area.line_of[late.id].latency = 1e9
+
+    end_time, chunks = topology.plan_parallel_transmission(device, sources, 500.)
+    assert sum(chunks) == pytest.approx(500.)
+    # the source starting after the others are done sends nothing
+    assert chunks[-1] == 0.
+    for source, chunk in zip(sources[:-1], chunks):
+        speed, latency, _ = topology.get_link_states_between_devices(device, source)
+        start = latency + topology.get_link_occupied_time(device, source)
+        if chunk:
+            assert start + chunk / ((speed+1e6) / 1000) == pytest.approx(end_time)
+        else:
+            assert start >= end_time
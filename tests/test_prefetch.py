@@ -0,0 +1,20 @@
+from packages.env.openraas.environment import Environment
+
+
+def test_released_layers_leave_pending(config):
+    env = Environment(dict(config, prefetch=1, prefetch_threshold=0.))
+    env.reset()
+    for _ in range(50):
+        env.step(0)
+    prefetcher = env.prefetcher
+    assert len(prefetcher.pending)
+    device_id, layer_id = next(iter(prefetcher.pending))
+    env.devices[device_id].remove_layer(env.layerList.get_data_by_id(layer_id))
+
+    # only the sweep of the released layers, no new push
+    prefetcher.threshold = float('inf')
+    prefetcher.push()
+    assert (device_id, layer_id) not in prefetcher.pending
+    for device_id, layer_id in prefetcher.pending:
+        assert env.layerList.get_data_by_id(layer_id) in env.devices[device_id].layers
+    assert 'prefetch/estimated_saved_fetch_time' in prefetcher.summary()
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from packages.env.openraas.environment import Environment
+
+
+def test_replicas_skip_compute_and_unavailable_filestores(config):
+    env = Environment(dict(config, storage_replicas=3))
+    task = env.new_tasks[env.task_index]
+    candidates = list(env.fs_candidates)
+    assert len(candidates) >= 4
+    compute, filestore, full = [env.devices[d] for d in candidates[:3]]
+    full.mem = 0.
+
+    selected = env.select_filestores(task, compute, filestore, len(candidates))
+    assert selected == [d for d in selected if d not in (compute.id, filestore.id, full.id)]
+    assert len(selected) and all(env.devices[d].check_task_availability(1, task) for d in selected)
+
+
+def test_upload_waits_for_the_quorum(config):
+    latencies = []
+    for quorum in [1, 3]:
+        np.random.seed(config['seed'])
+        env = Environment(dict(config, storage_replicas=3, replica_quorum=quorum))
+        env.step(0)
+        assert len(env.new_tasks[0].extra_filestores) == 2
+        latencies.append(env.qos_stats.summary()['service_latency'])
+    assert latencies[0] < latencies[1]
+
+
+def test_erasure_fallback_is_counted_as_striped(config):
+    env = Environment(dict(config, erasure_k=4, erasure_m=2))
+    task = env.new_tasks[env.task_index]
+    # fewer than k filestores left with room for a fragment
+    keep = [d for d in task.app.hosts if d != task.get_provider(0) and env.devices[d].check_task_availability(1, task)][:2]
+    for d in task.app.hosts:
+        if d not in keep and d != task.get_provider(0):
+            env.devices[d].mem = 0.
+    env.get_state()
+    assert round(task.mem / task.fragment_size) < env.erasure_k
+
+    env.step(0)
+    assert env.storage_stats.tasks == 1
+    assert (env.storage_stats.striped, env.storage_stats.degraded) == (1, 0)
+
+
+def test_erasure_coding_needs_a_filestore_per_fragment(config):
+    with pytest.raises(ValueError, match="erasure coding"):
+        Environment(dict(config, erasure_k=8, erasure_m=3))
+    with pytest.raises(ValueError, match="erasure coding"):
+        Environment(dict(config, candidates_num=4, erasure_k=3, erasure_m=2))
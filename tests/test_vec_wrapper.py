@@ -0,0 +1,9 @@
+from packages.env.vec_wrapper import _make_env
+
+
+def test_ranks_get_different_topologies(config):
+    seed = config['seed']
+    areas = [_make_env(config, seed + rank).env.topology.device_to_area for rank in range(2)]
+    assert areas[0] != areas[1]
+    # a rank is reproducible
+    assert _make_env(config, seed).env.topology.device_to_area == areas[0]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from packages.env.openraas.environment import Environment
+from packages.env.openraas.workload_trace import *
+
+
+def run_slots(env, slots):
+    """serve every task by its first candidate, returns the user ids of the tasks of every slot"""
+    env.reset()
+    users = [np.array(env.new_tasks.user_id)]
+    for _ in range(slots):
+        new_slot = False
+        while not new_slot:
+            _, _, new_slot = env.step(0)
+        users.append(np.array(env.new_tasks.user_id))
+    return users
+
+
+def test_replay_matches_recording(config, tmp_path):
+    path = str(tmp_path / 'workload.orwt')
+    recorded = run_slots(Environment(dict(config, batched_task_generation=1, record_workload=path)), 2)
+
+    replayed = run_slots(Environment(dict(config, replay_workload=path)), 2)
+    for a, b in zip(recorded, replayed):
+        assert np.array_equal(a, b)
+
+
+def test_replay_rejects_other_topology_size(config, tmp_path):
+    path = str(tmp_path / 'workload.orwt')
+    writer = WorkloadTraceWriter(path, config['M'], config['N'])
+    writer.write_episode()
+    writer.close()
+
+    reader = WorkloadTraceReader(path, M=config['M'], N=config['N'])
+    assert (reader.M, reader.N) == (config['M'], config['N'])
+    reader.close()
+    with pytest.raises(ValueError, match="recorded with"):
+        WorkloadTraceReader(path, M=config['M'] + 1, N=config['N'])
+    with pytest.raises(ValueError, match="recorded with"):
+        Environment(dict(config, N=config['N'] * 2, replay_workload=path))
+
+
+def test_external_trace_skips_empty_slots(config, tmp_path):
+    path = str(tmp_path / 'trace')
+    # no task between t=1 and t=4: slots 2, 3 and 4 are empty
+    save_columnar_trace(path, time=np.array([0., .5, 4.2, 4.7]), user_id=np.arange(4), type=np.ones(4, dtype=np.int64))
+    env = Environment(dict(config, external_trace=path, external_trace_slot_length=1.))
+    env.reset()
+    slots = [env.slot]
+    while len(slots) < 6:
+        assert env.tasks_num == 2
+        _, _, new_slot = env.step(-1)
+        if new_slot:
+            slots.append(env.slot)
+    # the trace is replayed from its beginning once exhausted, the empty slots pass without any state
+    assert set(np.diff(slots)) == {1, 4}